@@ -0,0 +1,78 @@
+# benchmark_name_normalization.py
+
+
+import random
+import re
+import time
+
+import extract_judges
+from support.judge_countries import JUDGE_COUNTRIES
+
+
+NUM_PREAMBLES = 50000
+NUM_REPEATS = 3
+RANDOM_SEED = 0
+
+
+def format_name(rng, name):
+  title = rng.choice(["", "", "Sir ", "Judge ", "M. "])
+  return title + " ".join([token.capitalize() for token in name.split(" ")])
+
+def generate_preambles(num_preambles, seed):
+  rng = random.Random(seed)
+  names = sorted(JUDGE_COUNTRIES.keys()) + sorted(extract_judges.JUDGE_REPLACEMENTS.keys())
+  preambles = []
+
+  for _ in range(num_preambles):
+    judges = [format_name(rng, name) for name in rng.sample(names, 15)]
+    lines = [
+      "President %s;" % (judges[0],),
+      "%s %s;" % (rng.choice(["Vice-President", "Acting Vice-President", "Vice President"]), judges[1]),
+      "Judges %s and %s;" % (", ".join(judges[2:12]), judges[12]),
+      "Judges ad hoc %s, %s;" % (judges[13], judges[14]),
+      "Registrar %s." % (format_name(rng, rng.choice(names)),),
+    ]
+    preambles.append("\n".join(lines))
+
+  return preambles
+
+def extract_fragments(preambles):
+  fragments = []
+  for preamble in preambles:
+    fragments += [fragment.strip() for fragment in re.split(",|;| and ", preamble.lower())]
+  return fragments
+
+def time_function(function, items, clear_cache = False):
+  times = []
+  for _ in range(NUM_REPEATS):
+    if (clear_cache):
+      extract_judges.clean_name.cache_clear()
+    start = time.perf_counter()
+    for item in items:
+      function(item)
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+
+def main():
+  preambles = generate_preambles(NUM_PREAMBLES, RANDOM_SEED)
+  fragments = extract_fragments(preambles)
+
+  stages = [
+    ("remove_titles", extract_judges.remove_titles, fragments, False),
+    ("clean_name_cold", extract_judges.clean_name, fragments, True),
+    ("clean_name_warm", extract_judges.clean_name, fragments, False),
+    ("parse_preamble", extract_judges.parse_preamble, preambles, True),
+  ]
+
+  print("stage\tnum_items\tseconds\titems_per_s")
+  for name, function, items, clear_cache in stages:
+    seconds = time_function(function, items, clear_cache = clear_cache)
+    print("%s\t%d\t%.4f\t%.0f" % (name, len(items), seconds, len(items) / seconds))
+  print(extract_judges.clean_name.cache_info())
+
+
+if (__name__ == "__main__"):
+  main()
+
+
@@ -0,0 +1,107 @@
+# benchmark_preparation.py
+
+
+import time
+import numpy as np
+from scipy.stats.mstats import zscore
+
+from support.regression import load_node_year_variables, prepare_base_variables, derive_regression_variables, prepare_regression_variables, prepare_offset
+from support.variable_computation import generate_lagged_variable_name
+import run_decision_regression as decision_regression
+import run_judge_regression as judge_regression
+
+
+LAG_LENGTHS = [1, 2, 3, 4, 5]
+NUM_REPEATS = 5
+
+
+def remove_variables(node_year_variables, keep):
+  remove = {v for v in node_year_variables.columns if (v not in keep)}
+  removed = node_year_variables.drop(columns = remove)
+  return removed.dropna()
+
+def standardize_variables(data, variables):
+  standardized = data.copy()
+  means = {}
+  deviations = {}
+
+  for variable in variables:
+    if (np.issubdtype(standardized[variable].dtype, np.number)):
+      variable_data = list(standardized[variable])
+      standardized[variable] = zscore(variable_data)
+      means[variable] = np.mean(variable_data)
+      deviations[variable] = np.std(variable_data)
+
+  return (standardized, means, deviations)
+
+def prepare_original_regression_variables(node_year_variables, independent_variables, dependent_variable, offset_variable, dependent_lags = {1,}):
+  lagged_dependent_variables = {generate_lagged_variable_name(dependent_variable, lag_length = lag_length) for lag_length in dependent_lags}
+  categorical_variables = set(node_year_variables.select_dtypes(exclude = ["number"]).columns).union({c for c in node_year_variables.columns if (c.startswith("categorical_"))}).intersection(set(independent_variables))
+  regressors = (set(independent_variables) | lagged_dependent_variables) - categorical_variables - {offset_variable}
+
+  regression_variables = remove_variables(node_year_variables, set(independent_variables) | {dependent_variable, *lagged_dependent_variables, offset_variable})
+  regression_variables, variable_means, variable_deviations = standardize_variables(regression_variables, regressors - lagged_dependent_variables)
+
+  regression_variables = regression_variables.reindex(sorted(regression_variables.columns), axis = 1)
+  prepare_offset(regression_variables, offset_variable)
+
+  return (regression_variables, regressors | categorical_variables, variable_means, variable_deviations)
+
+
+def generate_grid(independent_variable_sets, dependent_variables, control_variables, dependent_lags):
+  grid = []
+  for dependent_variable in dependent_variables:
+    lagged_control_variables = set(control_variables) | {generate_lagged_variable_name(dependent_variable, lag_length = lag_length) for lag_length in dependent_lags}
+    for independent_variables in independent_variable_sets:
+      grid.append((independent_variables | lagged_control_variables, dependent_variable))
+  return grid
+
+def time_preparation(node_year_variables, grid, offset_variable, dependent_lags):
+  original_times, per_model_times, batched_times = [], [], []
+
+  for _ in range(NUM_REPEATS):
+    start = time.perf_counter()
+    for independent_variables, dependent_variable in grid:
+      prepare_original_regression_variables(node_year_variables, independent_variables, dependent_variable, offset_variable, dependent_lags = dependent_lags)
+    original_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for independent_variables, dependent_variable in grid:
+      prepare_regression_variables(node_year_variables, independent_variables, dependent_variable, offset_variable, dependent_lags = dependent_lags)
+    per_model_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    base_variables = prepare_base_variables(node_year_variables)
+    for independent_variables, dependent_variable in grid:
+      derive_regression_variables(base_variables, independent_variables, dependent_variable, offset_variable, dependent_lags = dependent_lags)
+    batched_times.append(time.perf_counter() - start)
+
+  return (min(original_times), min(per_model_times), min(batched_times))
+
+
+def main():
+  datasets = [("decisions", decision_regression.INPUT_FILE_NAME, decision_regression.INDEX, decision_regression.INDEPENDENT_VARIABLES, decision_regression.CONTROL_VARIABLES, None)]
+  for network_type in judge_regression.NETWORK_TYPES:
+    independent_variables = judge_regression.SYMMETRIC_INDEPENDENT_VARIABLES if (network_type in judge_regression.SYMMETRIC_NETWORKS) else judge_regression.ASYMMETRIC_INDEPENDENT_VARIABLES
+    datasets.append((network_type + "_judges", judge_regression.generate_input_file_name(network_type), judge_regression.INDEX, independent_variables, judge_regression.CONTROL_VARIABLES, judge_regression.OFFSET_VARIABLE))
+
+  total_original, total_per_model, total_batched = 0.0, 0.0, 0.0
+  print("dataset\tlag_length\tnum_models\toriginal_s\tper_model_s\tbatched_s\tspeedup")
+  for name, file_name, index, independent_variable_sets, control_variables, offset_variable in datasets:
+    node_year_variables = load_node_year_variables(file_name, list(index))
+    for lag_length in LAG_LENGTHS:
+      dependent_lags = set(range(1, lag_length + 1))
+      grid = generate_grid(independent_variable_sets, decision_regression.DEPENDENT_VARIABLES, control_variables, dependent_lags)
+      original_time, per_model_time, batched_time = time_preparation(node_year_variables, grid, offset_variable, dependent_lags)
+      total_original += original_time
+      total_per_model += per_model_time
+      total_batched += batched_time
+      print("%s\t%d\t%d\t%.4f\t%.4f\t%.4f\t%.2f" % (name, lag_length, len(grid), original_time, per_model_time, batched_time, original_time / batched_time))
+
+  print("total\t\t\t%.4f\t%.4f\t%.4f\t%.2f" % (total_original, total_per_model, total_batched, total_original / total_batched))
+
+
+if (__name__ == "__main__"):
+  main()
+
+
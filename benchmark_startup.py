@@ -0,0 +1,55 @@
+# benchmark_startup.py
+
+
+import ast
+import subprocess
+import sys
+
+
+SCRIPT_FILE_NAMES = [
+  "run_adf_tests.py",
+  "run_decision_regression.py",
+  "run_judge_regression.py",
+  "evaluate_lag_lengths.py",
+]
+NUM_REPEATS = 5
+
+TIMING_CODE = """
+import time
+start = time.perf_counter()
+exec(compile({code!r}, "<imports>", "exec"))
+print(time.perf_counter() - start)
+"""
+R_INITIALIZATION_CODE = """
+from support.regression import initialize_r
+initialize_r()
+"""
+
+
+def extract_imports(file_name):
+  with open(file_name, "r") as script_file:
+    source = script_file.read()
+  statements = [n for n in ast.parse(source).body if (isinstance(n, (ast.Import, ast.ImportFrom)))]
+  return "\n".join([ast.get_source_segment(source, s) for s in statements])
+
+def time_code(code):
+  times = []
+  for _ in range(NUM_REPEATS):
+    output = subprocess.run([sys.executable, "-c", TIMING_CODE.format(code = code)], capture_output = True, text = True, check = True)
+    times.append(float(output.stdout.strip().splitlines()[-1]))
+  return min(times)
+
+
+def main():
+  print("script\tlazy_import_s\teager_import_s\tsaved_s")
+  for file_name in SCRIPT_FILE_NAMES:
+    imports = extract_imports(file_name)
+    lazy_time = time_code(imports)
+    eager_time = time_code(imports + "\n" + R_INITIALIZATION_CODE)
+    print("%s\t%.3f\t%.3f\t%.3f" % (file_name, lazy_time, eager_time, eager_time - lazy_time))
+
+
+if (__name__ == "__main__"):
+  main()
+
+
@@ -4,11 +4,11 @@
 
 
 from collections import Counter
-import networkx as nx
+from functools import partial
 
 from support.graph_processing import load_graph, extract_subgraph, simplify_weights, write_graph
-from support.variable_computation import compute_citations, compute_properties, compute_independent_variables, switch_keys, compute_damping_factor, compute_unanimities, generate_dependent_variable_name, compute_lagged_variables, write_variables, write_node_variables
-from support.agreement_generation import compute_direct_agreement, compute_indirect_agreement, compute_symmetric_indirect_agreement, compute_direct_and_indirect_agreement, compute_direct_and_symmetric_indirect_agreement
+from support.variable_computation import compute_citation_windows, compute_independent_variables, provide_degrees, provide_hits, switch_keys, compute_damping_factor, compute_unanimities, generate_dependent_variable_name, compute_panel_lagged_variables, map_years, write_variables, write_node_variables
+from support.agreement_generation import compute_agreements, compute_direct_agreement, compute_indirect_agreement, compute_symmetric_indirect_agreement, compute_direct_and_indirect_agreement, compute_direct_and_symmetric_indirect_agreement
 
 
 CITATION_GRAPH_FILE_NAME = "data/citation_graph.graphml"
@@ -29,19 +29,21 @@ GRAPH_GENERATORS = {
 }
 
 INDEPENDENT_VARIABLES = {
-  "in_degree": lambda g, d: compute_properties(g, g.in_degree, normalized = True),
-  "out_degree": lambda g, d: compute_properties(g, g.out_degree, normalized = True),
-  "hub": lambda g, d: nx.hits_numpy(g)[0],
-  "authority": lambda g, d: nx.hits_numpy(g)[1],
+  "in_degree": (provide_degrees, "in_degree"),
+  "out_degree": (provide_degrees, "out_degree"),
+  "hub": (provide_hits, "hub"),
+  "authority": (provide_hits, "authority"),
 }
 
 MAX_YEAR = 99999
+NUM_PROCESSES = 1
+FUSED_NETWORKS = True
+CENTRALITY_BACKEND = "numpy"
+CENTRALITY_TOLERANCE = 1.0e-10
 
 
-def compute_judge_citations(citation_graph, vote_graph, start_year, end_year):
+def compute_judge_citations(decision_citations, vote_graph):
   judge_citations = Counter()
-  vote_subgraph = extract_subgraph(vote_graph, start_year - 1)
-  decision_citations = compute_citations(citation_graph, start_year, end_year)
 
   for judge, attributes in vote_graph.nodes(data = True):
     if (attributes["class"] == "judge"):
@@ -55,8 +57,8 @@ def compute_judge_citations(citation_graph, vote_graph, start_year, end_year):
 
 def compute_dependent_variables(citation_graph, vote_graph, year_pairs):
   dependent_variables = {}
-  for (start_year, end_year) in year_pairs:
-    dependent_variables[end_year - start_year + 1] = compute_judge_citations(citation_graph, vote_graph, start_year, end_year)
+  for num_years, decision_citations in compute_citation_windows(citation_graph, year_pairs).items():
+    dependent_variables[num_years] = compute_judge_citations(decision_citations, vote_graph)
   return dependent_variables
 
 
@@ -118,51 +120,88 @@ def compute_judge_unanimities(citation_graph, vote_graph):
   return judge_unanimities
 
 
-def compute_variables(citation_graph, vote_graph, damping_factor, num_dependent_years, graph_generator, dependent_lags = {1,}):
-  judge_year_variables = {}
-  years = sorted({a["year"] for _, a in vote_graph.nodes(data = True)})
-  max_year = years[-1]
+def compute_shared_year_variables(citation_graph, vote_graph, num_dependent_years, max_year, year):
   max_dependent_years = max(num_dependent_years)
 
-  for year in range(years[0], max_year - min(num_dependent_years) + 1):
-    current_graph = simplify_weights(graph_generator(citation_graph, vote_graph, year))
-    judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, current_graph, damping_factor))
-
-    future_citation_graph = extract_subgraph(citation_graph, year + max_dependent_years)
-    future_vote_graph = extract_subgraph(vote_graph, year + max_dependent_years)
-    year_pairs = [(year + 1, year + num_years) for num_years in num_dependent_years]
-    dependent_variables = compute_dependent_variables(future_citation_graph, future_vote_graph, year_pairs)
-
-    judge_dependent_variables = {}
-    for num_years, judge_variables in dependent_variables.items():
-      if (year + num_years <= max_year):
-        judge_dependent_variables[generate_dependent_variable_name(num_years)] = judge_variables
-    judge_dependent_variables = switch_keys(judge_dependent_variables)
-
-    current_vote_graph = extract_subgraph(vote_graph, year)
-    judge_decisions = count_judge_decisions(current_vote_graph)
-    judge_unanimities = compute_judge_unanimities(extract_subgraph(citation_graph, year), current_vote_graph)
-    judge_votes, judge_member, judge_ad_hoc = count_judge_votes(current_vote_graph, year)
-
-    for judge, independent_variables in judge_independent_variables.items():
-      variables = {**independent_variables, **judge_dependent_variables[judge]}
-
-      variables["seniority"] = year - vote_graph.nodes[judge]["year"]
-      variables["seniority_squared"] = variables["seniority"] ** 2
-      variables["supported_decisions"] = judge_decisions[judge]
-      variables["average_unanimity"] = judge_unanimities[judge]
-      variables["current_year"] = year
-      variables["network_size"] = current_graph.number_of_nodes()
-      variables["num_votes_this_year"] = judge_votes[judge]
-      variables["member_this_year"] = str(judge_member[judge])
-      variables["ad_hoc_this_year"] = str(judge_ad_hoc[judge])
-
-      for dependent_variable in judge_dependent_variables[judge].keys():
-        variables.update(compute_lagged_variables(judge_year_variables, dependent_variable, judge, year, dependent_lags, normalizer_variable = "supported_decisions"))
+  future_vote_graph = extract_subgraph(vote_graph, year + max_dependent_years)
+  year_pairs = [(year + 1, year + num_years) for num_years in num_dependent_years]
+  dependent_variables = compute_dependent_variables(citation_graph, future_vote_graph, year_pairs)
+
+  judge_dependent_variables = {}
+  for num_years, judge_citations in dependent_variables.items():
+    if (year + num_years <= max_year):
+      judge_dependent_variables[generate_dependent_variable_name(num_years)] = judge_citations
+  judge_dependent_variables = switch_keys(judge_dependent_variables)
+
+  current_vote_graph = extract_subgraph(vote_graph, year)
+  judge_decisions = count_judge_decisions(current_vote_graph)
+  judge_unanimities = compute_judge_unanimities(extract_subgraph(citation_graph, year), current_vote_graph)
+  judge_votes, judge_member, judge_ad_hoc = count_judge_votes(current_vote_graph, year)
+
+  return (judge_dependent_variables, judge_decisions, judge_unanimities, judge_votes, judge_member, judge_ad_hoc)
+
+def compute_year_variables(vote_graph, current_graph, judge_independent_variables, shared_variables, year):
+  judge_variables = {}
+  judge_dependent_variables, judge_decisions, judge_unanimities, judge_votes, judge_member, judge_ad_hoc = shared_variables
+
+  for judge, independent_variables in judge_independent_variables.items():
+    variables = {**independent_variables, **judge_dependent_variables[judge]}
+
+    variables["seniority"] = year - vote_graph.nodes[judge]["year"]
+    variables["seniority_squared"] = variables["seniority"] ** 2
+    variables["supported_decisions"] = judge_decisions[judge]
+    variables["average_unanimity"] = judge_unanimities[judge]
+    variables["current_year"] = year
+    variables["network_size"] = current_graph.number_of_nodes()
+    variables["num_votes_this_year"] = judge_votes[judge]
+    variables["member_this_year"] = str(judge_member[judge])
+    variables["ad_hoc_this_year"] = str(judge_ad_hoc[judge])
+
+    judge_variables[judge] = variables
+
+  return judge_variables
 
+def compute_generated_year_variables(citation_graph, vote_graph, damping_factor, num_dependent_years, graph_generator, max_year, year):
+  current_graph = simplify_weights(graph_generator(citation_graph, vote_graph, year))
+  judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, current_graph, damping_factor, backend = CENTRALITY_BACKEND, tolerance = CENTRALITY_TOLERANCE))
+  shared_variables = compute_shared_year_variables(citation_graph, vote_graph, num_dependent_years, max_year, year)
+  return compute_year_variables(vote_graph, current_graph, judge_independent_variables, shared_variables, year)
+
+def compute_fused_year_variables(citation_graph, vote_graph, damping_factor, num_dependent_years, network_types, max_year, year):
+  network_judge_variables = {}
+  shared_variables = compute_shared_year_variables(citation_graph, vote_graph, num_dependent_years, max_year, year)
+
+  for network_type, agreement_graph in compute_agreements(citation_graph, vote_graph, year, network_types).items():
+    current_graph = simplify_weights(agreement_graph)
+    judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, current_graph, damping_factor, backend = CENTRALITY_BACKEND, tolerance = CENTRALITY_TOLERANCE))
+    network_judge_variables[network_type] = compute_year_variables(vote_graph, current_graph, judge_independent_variables, shared_variables, year)
+
+  return network_judge_variables
+
+
+def assemble_lagged_variables(year_variables, variable_years, num_dependent_years, dependent_lags):
+  judge_year_variables = {}
+  for year, judge_variables in zip(variable_years, year_variables):
+    for judge, variables in judge_variables.items():
       judge_year_variables[(judge, year)] = variables
+  return compute_panel_lagged_variables(judge_year_variables, num_dependent_years, dependent_lags, normalizer_variable = "supported_decisions")
+
+def compute_variable_years(vote_graph, num_dependent_years):
+  years = sorted({a["year"] for _, a in vote_graph.nodes(data = True)})
+  return (list(range(years[0], years[-1] - min(num_dependent_years) + 1)), years[-1])
+
+
+def compute_variables(citation_graph, vote_graph, damping_factor, num_dependent_years, graph_generator, dependent_lags = {1,}, num_processes = 1):
+  variable_years, max_year = compute_variable_years(vote_graph, num_dependent_years)
+  year_function = partial(compute_generated_year_variables, citation_graph, vote_graph, damping_factor, num_dependent_years, graph_generator, max_year)
+  year_variables = map_years(year_function, variable_years, num_processes = num_processes)
+  return assemble_lagged_variables(year_variables, variable_years, num_dependent_years, dependent_lags)
 
-  return judge_year_variables
+def compute_fused_variables(citation_graph, vote_graph, damping_factor, num_dependent_years, network_types, dependent_lags = {1,}, num_processes = 1):
+  variable_years, max_year = compute_variable_years(vote_graph, num_dependent_years)
+  year_function = partial(compute_fused_year_variables, citation_graph, vote_graph, damping_factor, num_dependent_years, network_types, max_year)
+  year_variables = map_years(year_function, variable_years, num_processes = num_processes)
+  return {t: assemble_lagged_variables([v[t] for v in year_variables], variable_years, num_dependent_years, dependent_lags) for t in network_types}
 
 
 def generate_output_file_name(network_type):
@@ -175,23 +214,29 @@ def main():
   damping_factor = compute_damping_factor(compute_unanimities(citation_graph))
   print(damping_factor)
 
-  for network_type, graph_generator in GRAPH_GENERATORS.items():
-    judge_year_variables = compute_variables(citation_graph, vote_graph, damping_factor, list(range(1, 11)), graph_generator, {1, 2, 3, 4, 5})
-    write_variables(generate_output_file_name(network_type), judge_year_variables, "judge")
+  if (FUSED_NETWORKS):
+    network_judge_year_variables = compute_fused_variables(citation_graph, vote_graph, damping_factor, list(range(1, 11)), list(GRAPH_GENERATORS.keys()), {1, 2, 3, 4, 5}, num_processes = NUM_PROCESSES)
+    for network_type, judge_year_variables in network_judge_year_variables.items():
+      write_variables(generate_output_file_name(network_type), judge_year_variables, "judge")
+  else:
+    for network_type, graph_generator in GRAPH_GENERATORS.items():
+      judge_year_variables = compute_variables(citation_graph, vote_graph, damping_factor, list(range(1, 11)), graph_generator, {1, 2, 3, 4, 5}, num_processes = NUM_PROCESSES)
+      write_variables(generate_output_file_name(network_type), judge_year_variables, "judge")
 
   direct_graph = compute_direct_agreement(citation_graph, vote_graph, MAX_YEAR)
-  judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, direct_graph, damping_factor))
+  judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, direct_graph, damping_factor, backend = CENTRALITY_BACKEND, tolerance = CENTRALITY_TOLERANCE))
   write_node_variables(DIRECT_OUTPUT_FILE_NAME, judge_independent_variables, "judge")
 
   #indirect_graph = compute_direct_and_indirect_agreement(citation_graph, vote_graph, MAX_YEAR)
-  #judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, indirect_graph, damping_factor))
+  #judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, indirect_graph, damping_factor, backend = CENTRALITY_BACKEND, tolerance = CENTRALITY_TOLERANCE))
   #write_node_variables(DIRECT_INDIRECT_OUTPUT_FILE_NAME, judge_independent_variables, "judge")
 
   symmetric_graph = compute_direct_and_symmetric_indirect_agreement(citation_graph, vote_graph, MAX_YEAR)
-  judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, symmetric_graph, damping_factor))
+  judge_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, symmetric_graph, damping_factor, backend = CENTRALITY_BACKEND, tolerance = CENTRALITY_TOLERANCE))
   write_node_variables(DIRECT_SYMMETRIC_INDIRECT_OUTPUT_FILE_NAME, judge_independent_variables, "judge")
 
 
-main()
+if (__name__ == "__main__"):
+  main()
 
 
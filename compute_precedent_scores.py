@@ -4,10 +4,13 @@
 
 
 import csv
+from functools import partial
+from itertools import repeat
+import numpy as np
 import networkx as nx
 
-from support.graph_processing import load_graph, extract_subgraph
-from support.variable_computation import compute_citations, compute_properties, compute_independent_variables, compute_unanimities, compute_damping_factor, switch_keys, generate_dependent_variable_name, compute_lagged_variables, write_variables, write_node_variables
+from support.graph_processing import load_graph, extract_subgraph, group_by_year, extend_subgraph
+from support.variable_computation import compute_citations, compute_citation_windows, compute_independent_variables, provide, provide_adjacency, provide_degrees, provide_pagerank, provide_hits, compute_unanimities, compute_damping_factor, switch_keys, generate_dependent_variable_name, compute_panel_lagged_variables, map_years, write_variables, write_node_variables
 
 
 AUTHORSHIP_FILE_NAME = "data/authorship.csv"
@@ -15,113 +18,198 @@ CITATION_GRAPH_FILE_NAME = "data/citation_graph.graphml"
 OUTPUT_FILE_NAME = "data/decision_variables.csv"
 FINAL_VARIABLES_FILE_NAME = "data/final_decision_variables.csv"
 
+INCREMENTAL = False
+NUM_PROCESSES = 1
+CENTRALITY_BACKEND = "numpy"
+INCREMENTAL_CENTRALITY_BACKEND = "power"
+CENTRALITY_TOLERANCE = 1.0e-10
+
 INDEPENDENT_VARIABLES = {
-  "reverse_pagerank": lambda g, d: compute_precedent_scores(g, d, unanimity = False, weighted = False),
-  "unanimity": lambda g, d: compute_unanimities(g),
-  "in_degree": lambda g, d: compute_properties(g, g.in_degree, normalized = True),
-  "out_degree": lambda g, d: compute_properties(g, g.out_degree, normalized = True),
-  "pagerank": lambda g, d: nx.pagerank_numpy(g, alpha = d),
-  "hub": lambda g, d: nx.hits_numpy(g)[0],
-  "authority": lambda g, d: nx.hits_numpy(g)[1],
+  "reverse_pagerank": (lambda c: compute_precedent_scores(c["graph"], c["damping_factor"], unanimity = False, weighted = False), None),
+  "unanimity": (lambda c: compute_unanimities(c["graph"]), None),
+  "in_degree": (provide_degrees, "in_degree"),
+  "out_degree": (provide_degrees, "out_degree"),
+  "pagerank": (provide_pagerank, "pagerank"),
+  "hub": (provide_hits, "hub"),
+  "authority": (provide_hits, "authority"),
+}
+INCREMENTAL_INDEPENDENT_VARIABLES = {
+  "reverse_pagerank": (lambda c: update_precedent_scores(c["graph"], c["damping_factor"], c["previous_variables"].get("reverse_pagerank"), c["changed_nodes"], provide(c, provide_adjacency), unanimity = False, weighted = False), None),
+  "unanimity": (lambda c: compute_unanimities(c["graph"]), None),
+  "in_degree": (provide_degrees, "in_degree"),
+  "out_degree": (provide_degrees, "out_degree"),
+  "pagerank": (provide_pagerank, "pagerank"),
+  "hub": (provide_hits, "hub"),
+  "authority": (provide_hits, "authority"),
 }
 DEPENDENT_VARIABLES = {
   "citations_next_year": lambda g, s_y, e_y: compute_citations(g, s_y, e_y),
 }
 
 
+def compute_descendant_counts(adjacency):
+  num_decisions = adjacency.shape[0]
+  descendants = [0] * num_decisions
+  for i in reversed(range(num_decisions)):
+    for j in adjacency.indices[adjacency.indptr[i]:adjacency.indptr[i + 1]]:
+      descendants[i] |= descendants[j] | (1 << int(j))
+  return np.array([bin(d).count("1") for d in descendants], dtype = float)
+
+def compute_sweep_levels(adjacency, scored, order = None):
+  levels = np.full(adjacency.shape[0], -1)
+  for i in reversed(range(adjacency.shape[0]) if (order is None) else order):
+    if (not scored[i]):
+      successors = adjacency.indices[adjacency.indptr[i]:adjacency.indptr[i + 1]]
+      levels[i] = (levels[successors].max() + 1) if (len(successors) > 0) else 0
+  return levels
+
+def find_stale_decisions(citation_graph, changed_decisions):
+  stale_decisions = set(changed_decisions)
+  frontier = list(stale_decisions)
+  while (frontier):
+    for predecessor in citation_graph.predecessors(frontier.pop()):
+      if (predecessor not in stale_decisions):
+        stale_decisions.add(predecessor)
+        frontier.append(predecessor)
+  return stale_decisions
+
+def sweep_precedent_scores(adjacency, first_terms, scores, levels, rows, damping_factor):
+  if (len(rows) == 0):
+    return scores
+
+  level_order = rows[np.argsort(levels[rows], kind = "stable")]
+  level_bounds = np.searchsorted(levels[level_order], np.arange(levels[rows].max() + 2))
+
+  for level in range(levels[rows].max() + 1):
+    level_rows = level_order[level_bounds[level]:level_bounds[level + 1]]
+    level_adjacency = adjacency[level_rows]
+    normalizers = np.asarray(level_adjacency.sum(axis = 1)).flatten()
+    normalizers[normalizers == 0] = 1.0
+    scores[level_rows] = first_terms[level_rows] + (damping_factor * ((level_adjacency * scores) / normalizers))
+
+  return scores
+
+
 def compute_precedent_scores(citation_graph, damping_factor, unanimity = False, weighted = False, normalize = False):
-  decision_scores = {}
-  num_decisions = citation_graph.number_of_nodes()
-  decision_unanimities = (compute_unanimities(citation_graph) if (unanimity) else None)
+  decisions = list(nx.topological_sort(citation_graph))
+  num_decisions = len(decisions)
   complement = (1.0 - damping_factor) / float(num_decisions)
+  adjacency = nx.to_scipy_sparse_matrix(citation_graph, nodelist = decisions, weight = ("weight" if (weighted) else None), dtype = float, format = "csr")
 
-  while (len(decision_scores) < num_decisions):
-    for decision, attributes in citation_graph.nodes(data = True):
-      successors = list(citation_graph.successors(decision))
+  first_terms = np.full(num_decisions, complement)
+  if (normalize):
+    num_descendants = compute_descendant_counts(adjacency)
+    first_terms[num_descendants > 0] /= num_descendants[num_descendants > 0]
+  if (unanimity):
+    decision_unanimities = compute_unanimities(citation_graph)
+    first_terms *= np.array([decision_unanimities[d] for d in decisions])
 
-      if (all([n in decision_scores for n in successors])):
-        first_term = complement
-        scores = [decision_scores[d] for d in successors]
-        normalizer = len(scores)
-        average_score = 0
+  levels = compute_sweep_levels(adjacency, np.zeros(num_decisions, dtype = bool))
+  scores = sweep_precedent_scores(adjacency, first_terms, np.zeros(num_decisions), levels, np.arange(num_decisions), damping_factor)
+  return dict(zip(decisions, scores.tolist()))
 
-        if (normalize):
-          num_descendants = len(nx.descendants(citation_graph, decision))
-          if (num_descendants > 0):
-            first_term /= float(num_descendants)
+def update_precedent_scores(citation_graph, damping_factor, previous_scores, changed_decisions, adjacency, unanimity = False, weighted = False, normalize = False):
+  if (normalize):
+    return compute_precedent_scores(citation_graph, damping_factor, unanimity = unanimity, weighted = weighted, normalize = normalize)
 
-        if (weighted):
-          weights = [citation_graph.get_edge_data(decision, s)["weight"] for s in successors]
-          scores = [s * w for s, w in zip(scores, weights)]
-          normalizer = sum(weights)
+  previous_scores = previous_scores if (previous_scores) else {}
+  decisions, decision_indices = adjacency["nodes"], adjacency["node_indices"]
+  num_decisions = len(decisions)
+  matrix = adjacency["weights" if (weighted) else "edges"]
 
-        if (scores):
-          average_score = float(sum(scores)) / float(normalizer)
-        if (unanimity):
-          first_term *= decision_unanimities[decision]
+  stale_decisions = find_stale_decisions(citation_graph, set(changed_decisions).union(decisions[len(previous_scores):]))
+  rows = np.array([decision_indices[d] for d in nx.topological_sort(citation_graph.subgraph(stale_decisions))], dtype = int)
+  scored = np.ones(num_decisions, dtype = bool)
+  scored[rows] = False
 
-        decision_scores[decision] = first_term + (damping_factor * average_score)
+  first_terms = np.full(num_decisions, (1.0 - damping_factor) / float(num_decisions))
+  if (unanimity):
+    decision_unanimities = compute_unanimities(citation_graph.subgraph(stale_decisions))
+    first_terms[rows] *= np.array([decision_unanimities[decisions[i]] for i in rows])
 
-  return decision_scores
+  scale = float(len(previous_scores)) / float(num_decisions)
+  scores = np.fromiter(map(previous_scores.get, decisions, repeat(0.0)), dtype = float, count = num_decisions) * scale
+  scores = sweep_precedent_scores(matrix, first_terms, scores, compute_sweep_levels(matrix, scored, order = rows), rows, damping_factor)
+  return dict(zip(decisions, scores.tolist()))
 
 
-def compute_dependent_variables(citation_graph, year_pairs):
-  dependent_variables = {}
-  for (start_year, end_year) in year_pairs:
-    dependent_variables[end_year - start_year + 1] = compute_citations(citation_graph, start_year, end_year)
-  return dependent_variables
+def compute_dependent_variables(citation_graph, year_pairs, decisions):
+  return compute_citation_windows(citation_graph, year_pairs, nodes = decisions)
 
 
-def compute_variables(citation_graph, damping_factor, num_dependent_years, dependent_lags = {1,}):
-  decision_year_variables = {}
-  years = sorted({a["year"] for _, a in citation_graph.nodes(data = True)})
-  max_year = years[-1]
-  max_dependent_years = max(num_dependent_years)
+def compute_year_variables(citation_graph, current_graph, decision_independent_variables, num_dependent_years, max_year, year):
+  decision_variables = {}
+
+  year_pairs = [(year + 1, year + num_years) for num_years in num_dependent_years]
+  dependent_variables = compute_dependent_variables(citation_graph, year_pairs, decision_independent_variables.keys())
+
+  decision_dependent_variables = {}
+  for num_years, decision_citations in dependent_variables.items():
+    if (year + num_years <= max_year):
+      decision_dependent_variables[generate_dependent_variable_name(num_years)] = decision_citations
+  decision_dependent_variables = switch_keys(decision_dependent_variables)
 
-  for year in range(years[0], max_year - min(num_dependent_years) + 1):
-    current_graph = extract_subgraph(citation_graph, year)
-    decision_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, current_graph, damping_factor))
+  for decision, independent_variables in decision_independent_variables.items():
+    variables = {**independent_variables, **decision_dependent_variables[decision]}
 
-    future_graph = extract_subgraph(citation_graph, year + max_dependent_years)
-    year_pairs = [(year + 1, year + num_years) for num_years in num_dependent_years]
-    dependent_variables = compute_dependent_variables(future_graph, year_pairs)
+    variables["age"] = year - citation_graph.nodes[decision]["year"]
+    variables["age_squared"] = variables["age"] ** 2
+    variables["type"] = citation_graph.nodes[decision]["type"].lower()
+    variables["topic"] = citation_graph.nodes[decision]["topic"].lower()
+    variables["num_votes"] = citation_graph.nodes[decision]["votes_for"] + citation_graph.nodes[decision]["votes_against"]
+    variables["current_year"] = year
+    variables["network_size"] = current_graph.number_of_nodes()
 
-    decision_dependent_variables = {}
-    for num_years, decision_variables in dependent_variables.items():
-      if (year + num_years <= max_year):
-        decision_dependent_variables[generate_dependent_variable_name(num_years)] = decision_variables
-    decision_dependent_variables = switch_keys(decision_dependent_variables)
+    decision_variables[decision] = variables
 
-    for decision, independent_variables in decision_independent_variables.items():
-      variables = {**independent_variables, **decision_dependent_variables[decision]}
+  return decision_variables
 
-      variables["age"] = year - citation_graph.nodes[decision]["year"]
-      variables["age_squared"] = variables["age"] ** 2
-      variables["type"] = citation_graph.nodes[decision]["type"].lower()
-      variables["topic"] = citation_graph.nodes[decision]["topic"].lower()
-      variables["num_votes"] = citation_graph.nodes[decision]["votes_for"] + citation_graph.nodes[decision]["votes_against"]
-      variables["current_year"] = year
-      variables["network_size"] = current_graph.number_of_nodes()
+def compute_extracted_year_variables(citation_graph, damping_factor, num_dependent_years, max_year, year):
+  current_graph = extract_subgraph(citation_graph, year)
+  decision_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, current_graph, damping_factor, backend = CENTRALITY_BACKEND, tolerance = CENTRALITY_TOLERANCE))
+  return compute_year_variables(citation_graph, current_graph, decision_independent_variables, num_dependent_years, max_year, year)
 
-      for dependent_variable in decision_dependent_variables[decision].keys():
-        variables.update(compute_lagged_variables(decision_year_variables, dependent_variable, decision, year, dependent_lags, normalizer_variable = None))
 
+def compute_variables(citation_graph, damping_factor, num_dependent_years, dependent_lags = {1,}, incremental = False, num_processes = 1):
+  decision_year_variables = {}
+  years = sorted({a["year"] for _, a in citation_graph.nodes(data = True)})
+  max_year = years[-1]
+  variable_years = list(range(years[0], max_year - min(num_dependent_years) + 1))
+
+  if (incremental):
+    year_nodes, year_edges = group_by_year(citation_graph)
+    current_graph = nx.DiGraph()
+    previous_variables = {}
+    state = {}
+    year_variables = []
+
+    for year in variable_years:
+      previous_year = (year - 1) if (year > years[0]) else None
+      changed_decisions = extend_subgraph(current_graph, year_nodes, year_edges, previous_year, year)
+      previous_variables = compute_independent_variables(INCREMENTAL_INDEPENDENT_VARIABLES, current_graph, damping_factor, previous_variables = previous_variables, changed_nodes = changed_decisions, state = state, backend = INCREMENTAL_CENTRALITY_BACKEND, tolerance = CENTRALITY_TOLERANCE)
+      year_variables.append(compute_year_variables(citation_graph, current_graph, switch_keys(previous_variables), num_dependent_years, max_year, year))
+  else:
+    year_variables = map_years(partial(compute_extracted_year_variables, citation_graph, damping_factor, num_dependent_years, max_year), variable_years, num_processes = num_processes)
+
+  for year, decision_variables in zip(variable_years, year_variables):
+    for decision, variables in decision_variables.items():
       decision_year_variables[(decision, year)] = variables
 
-  return decision_year_variables
+  return compute_panel_lagged_variables(decision_year_variables, num_dependent_years, dependent_lags, normalizer_variable = None)
 
 
 def main():
   citation_graph = load_graph(CITATION_GRAPH_FILE_NAME)
   damping_factor = compute_damping_factor(compute_unanimities(citation_graph))
   print(damping_factor)
-  decision_year_variables = compute_variables(citation_graph, damping_factor, list(range(1, 11)), dependent_lags = {1, 2, 3, 4, 5})
+  decision_year_variables = compute_variables(citation_graph, damping_factor, list(range(1, 11)), dependent_lags = {1, 2, 3, 4, 5}, incremental = INCREMENTAL, num_processes = NUM_PROCESSES)
   write_variables(OUTPUT_FILE_NAME, decision_year_variables, "decision")
 
-  decision_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, citation_graph, damping_factor))
+  decision_independent_variables = switch_keys(compute_independent_variables(INDEPENDENT_VARIABLES, citation_graph, damping_factor, backend = CENTRALITY_BACKEND, tolerance = CENTRALITY_TOLERANCE))
   write_node_variables(FINAL_VARIABLES_FILE_NAME, decision_independent_variables, "decision")
 
 
-main()
+if (__name__ == "__main__"):
+  main()
 
 
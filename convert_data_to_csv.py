@@ -11,6 +11,11 @@ INPUT_FILE_NAME = "data/original.json"
 OUTPUT_FILE_NAME = "data/cases.csv"
 CITATIONS_FILE_NAME = "data/citations.csv"
 
+STREAMING_INGESTION = True
+JSON_CHUNK_SIZE = 1 << 16
+JSON_WHITESPACE = " \t\n\r"
+JSON_DELIMITERS = ",:]}"
+
 NAME_REPLACEMENTS = {
   "Advisory Opinion.{2,40}Kosovo": "Advisory Opinion on Kosovo",
   "Ahmadou Sadio Diallo ( Guinea v. Congo)": "Ahmadou Sadio Diallo (Guinea v. Congo)",
@@ -28,29 +33,111 @@ def load_data(file_name):
   return data
 
 
-def isolate_attributes(data):
-  isolated = {}
-
-  for node in data["nodes"]:
-    name = node["label"]
-    if (name in NAME_REPLACEMENTS):
-      name = NAME_REPLACEMENTS[name]
+def read_json_chunk(stream):
+  chunk = stream["file"].read(JSON_CHUNK_SIZE)
+  stream["buffer"] = stream["buffer"][stream["position"]:] + chunk
+  stream["position"] = 0
+  return bool(chunk)
+
+def skip_json_whitespace(buffer, position):
+  while ((position < len(buffer)) and (buffer[position] in JSON_WHITESPACE)):
+    position += 1
+  return position
+
+def peek_json_character(stream):
+  while (True):
+    buffer = stream["buffer"]
+    position = skip_json_whitespace(buffer, stream["position"])
+    stream["position"] = position
+
+    if (position < len(buffer)):
+      return buffer[position]
+    if (not read_json_chunk(stream)):
+      return ""
+
+def expect_json_character(stream, character):
+  if (peek_json_character(stream) != character):
+    raise ValueError("Expected %r at this point in the JSON data" % (character,))
+  stream["position"] += 1
+
+def decode_json_value(stream):
+  peek_json_character(stream)
+  while (True):
+    start = stream["position"]
+    try:
+      value, end = stream["decoder"].raw_decode(stream["buffer"], start)
+    except json.JSONDecodeError:
+      if (not read_json_chunk(stream)):
+        raise
+      continue
+
+    delimiter = skip_json_whitespace(stream["buffer"], end)
+    if ((delimiter < len(stream["buffer"])) and (stream["buffer"][delimiter] in JSON_DELIMITERS)):
+      stream["position"] = end
+      return value
+    if (not read_json_chunk(stream)):
+      stream["position"] = end - start
+      return value
+
+def stream_json_arrays(file_name):
+  with open(file_name, "r") as input_file:
+    stream = {"file": input_file, "buffer": "", "position": 0, "decoder": json.JSONDecoder()}
+    expect_json_character(stream, "{")
+
+    while (peek_json_character(stream) != "}"):
+      if (peek_json_character(stream) == ","):
+        stream["position"] += 1
+        continue
+
+      key = decode_json_value(stream)
+      expect_json_character(stream, ":")
+      if (peek_json_character(stream) != "["):
+        decode_json_value(stream)
+        continue
+
+      stream["position"] += 1
+      while (peek_json_character(stream) != "]"):
+        if (peek_json_character(stream) == ","):
+          stream["position"] += 1
+        else:
+          yield (key, decode_json_value(stream))
+      stream["position"] += 1
+
+
+def isolate_node(node):
+  name = node["label"]
+  if (name in NAME_REPLACEMENTS):
+    name = NAME_REPLACEMENTS[name]
+
+  attributes = node["attributes"]
+  year = attributes["Year"]
+  case_type = attributes["Type"]
+
+  return (node["id"], {"name": name.strip(), "year": year.strip(), "type": case_type.strip()})
+
+def assign_edge_topics(decision_topics, edge):
+  source_topic = edge["attributes"]["Source Type"].strip()
+  target_topic = edge["attributes"]["Target Type"].strip()
+
+  for decision, topic in zip([edge["source"], edge["target"]], [source_topic, target_topic]):
+    if ((decision in decision_topics) and (decision_topics[decision] != topic)):
+      print("ERROR", decision)
+    else:
+      decision_topics[decision] = topic.strip()
 
-    attributes = node["attributes"]
-    year = attributes["Year"]
-    case_type = attributes["Type"]
+def isolate_citation(edge):
+  citation = (edge["source"], edge["target"])
+  excluded = (edge["id"], edge["attributes"]["Citation ID"], *citation) if (citation in EXCLUDE_CITATIONS) else None
+  return (citation, excluded)
 
-    isolated[node["id"]] = {"name": name.strip(), "year": year.strip(), "type": case_type.strip()}
+def isolate_attributes(data):
+  isolated = dict([isolate_node(node) for node in data["nodes"]])
 
+  decision_topics = {}
   for edge in data["edges"]:
-    source_topic = edge["attributes"]["Source Type"].strip()
-    target_topic = edge["attributes"]["Target Type"].strip()
-
-    for decision, topic in zip([edge["source"], edge["target"]], [source_topic, target_topic]):
-      if (("topic" in isolated[decision]) and (isolated[decision]["topic"] != topic)):
-        print("ERROR", decision)
-      else:
-        isolated[decision]["topic"] = topic.strip()
+    assign_edge_topics(decision_topics, edge)
+  for decision, topic in decision_topics.items():
+    isolated[decision]["topic"] = topic
 
   return isolated
 
@@ -58,11 +145,11 @@ def isolate_citations(data):
   isolated = []
   excluded = []
   for edge in data["edges"]:
-    citation = (edge["source"], edge["target"])
-    if (citation not in EXCLUDE_CITATIONS):
-      isolated.append(citation)
+    citation, excluded_citation = isolate_citation(edge)
+    if (excluded_citation):
+      excluded.append(excluded_citation)
     else:
-      excluded.append((edge["id"], edge["attributes"]["Citation ID"], *citation))
+      isolated.append(citation)
   return (isolated, excluded)
 
 
@@ -86,13 +173,42 @@ def write_citations(file_name, citations):
       writer.writerow(list(citation))
 
 
+def convert_data(input_file_name, attributes_file_name, citations_file_name):
+  attributes, decision_topics, excluded = {}, {}, []
+
+  with open(citations_file_name, "w") as citations_file:
+    writer = csv.writer(citations_file)
+    writer.writerow(["source", "target"])
+
+    for key, element in stream_json_arrays(input_file_name):
+      if (key == "nodes"):
+        id, node_attributes = isolate_node(element)
+        attributes[id] = node_attributes
+      elif (key == "edges"):
+        assign_edge_topics(decision_topics, element)
+        citation, excluded_citation = isolate_citation(element)
+        if (excluded_citation):
+          excluded.append(excluded_citation)
+        else:
+          writer.writerow(list(citation))
+
+  for decision, topic in decision_topics.items():
+    attributes[decision]["topic"] = topic
+  write_attributes(attributes_file_name, attributes)
+
+  return excluded
+
+
 def main():
-  data = load_data(INPUT_FILE_NAME)
-  attributes = isolate_attributes(data)
-  write_attributes(OUTPUT_FILE_NAME, attributes)
+  if (STREAMING_INGESTION):
+    excluded = convert_data(INPUT_FILE_NAME, OUTPUT_FILE_NAME, CITATIONS_FILE_NAME)
+  else:
+    data = load_data(INPUT_FILE_NAME)
+    attributes = isolate_attributes(data)
+    write_attributes(OUTPUT_FILE_NAME, attributes)
 
-  citations, excluded = isolate_citations(data)
-  write_citations(CITATIONS_FILE_NAME, citations)
+    citations, excluded = isolate_citations(data)
+    write_citations(CITATIONS_FILE_NAME, citations)
 
   print()
   print("=== Excluded Citations ===")
@@ -101,6 +217,7 @@ def main():
   print()
 
 
-main()
+if (__name__ == "__main__"):
+  main()
 
 
@@ -5,7 +5,7 @@
 
 from collections import Counter
 
-from support.regression import load_node_year_variables, generate_variable_coefficients
+from support.regression import load_node_year_variables, prepare_base_variables, generate_variable_coefficients
 
 
 DECISION_FILE_NAME = "data/decision_variables.csv"
@@ -32,6 +32,9 @@ JUDGE_TABLE_FILE_NAME = "tables/judge_tables/"
 
 TIME_VARIABLE = "current_year"
 DEPENDENT_VARIABLES = ["citations_next_year", "citations_next_5_years", "citations_next_10_years"]
+MAX_LAG_LENGTH = 5
+WARM_START_LAG_SEARCH = True
+NUM_PROCESSES = 1
 
 
 def compute_dependent_avg_qaic(dependent_independent_results):
@@ -52,6 +55,17 @@ def find_optimal_lag_length(lag_dependent_independent_results):
   return dependent_opt_lag
 
 
+def search_lag_lengths(node_year_variables, independent_variable_sets, control_variables, offset_variable = None):
+  base_variables = prepare_base_variables(node_year_variables)
+  lag_variable_coefficients = {}
+
+  for lag_length in range(1, MAX_LAG_LENGTH + 1):
+    start_results = lag_variable_coefficients.get(lag_length - 1) if (WARM_START_LAG_SEARCH) else None
+    lag_variable_coefficients[lag_length] = generate_variable_coefficients(node_year_variables, independent_variable_sets, DEPENDENT_VARIABLES, control_variables, offset_variable = offset_variable, dependent_lags = set(range(1, lag_length + 1)), num_processes = NUM_PROCESSES, base_variables = base_variables, start_results = start_results)
+
+  return lag_variable_coefficients
+
+
 def find_max_dependent_changes(independent_results_a, independent_results_b):
   coeff_change, ame_change, sig_changes = 0, 0, set()
 
@@ -84,17 +98,17 @@ def print_dependent_data(dependent_data):
 
 def main():
   node_year_variables = load_node_year_variables(DECISION_FILE_NAME, DECISION_INDEX)
-  lag_variable_coefficients = {l: generate_variable_coefficients(node_year_variables, DECISION_INDEPENDENT_VARIABLES, DEPENDENT_VARIABLES, DECISION_CONTROL_VARIABLES, dependent_lags = set(range(1, l + 1))) for l in range(1, 6)}
+  lag_variable_coefficients = search_lag_lengths(node_year_variables, DECISION_INDEPENDENT_VARIABLES, DECISION_CONTROL_VARIABLES)
   decision_lags = find_optimal_lag_length(lag_variable_coefficients)
   decision_coeff_changes, decision_ame_changes, decision_sig_changes = find_max_changes(decision_lags, lag_variable_coefficients)
 
   node_year_variables = load_node_year_variables(JUDGE_DIRECT_FILE_NAME, JUDGE_INDEX)
-  lag_variable_coefficients = {l: generate_variable_coefficients(node_year_variables, JUDGE_INDEPENDENT_VARIABLES, DEPENDENT_VARIABLES, JUDGE_CONTROL_VARIABLES, offset_variable = JUDGE_OFFSET_VARIABLE, dependent_lags = set(range(1, l + 1))) for l in range(1, 6)}
+  lag_variable_coefficients = search_lag_lengths(node_year_variables, JUDGE_INDEPENDENT_VARIABLES, JUDGE_CONTROL_VARIABLES, offset_variable = JUDGE_OFFSET_VARIABLE)
   direct_judge_lags = find_optimal_lag_length(lag_variable_coefficients)
   direct_judge_coeff_changes, direct_judge_ame_changes, direct_judge_sig_changes = find_max_changes(direct_judge_lags, lag_variable_coefficients)
 
   node_year_variables = load_node_year_variables(JUDGE_DIRECT_SYM_INDIRECT_FILE_NAME, JUDGE_INDEX)
-  lag_variable_coefficients = {l: generate_variable_coefficients(node_year_variables, JUDGE_INDEPENDENT_VARIABLES, DEPENDENT_VARIABLES, JUDGE_CONTROL_VARIABLES, offset_variable = JUDGE_OFFSET_VARIABLE, dependent_lags = set(range(1, l + 1))) for l in range(1, 6)}
+  lag_variable_coefficients = search_lag_lengths(node_year_variables, JUDGE_INDEPENDENT_VARIABLES, JUDGE_CONTROL_VARIABLES, offset_variable = JUDGE_OFFSET_VARIABLE)
   direct_sym_indirect_judge_lags = find_optimal_lag_length(lag_variable_coefficients)
   direct_sym_indirect_judge_coeff_changes, direct_sym_indirect_judge_ame_changes, direct_sym_indirect_judge_sig_changes = find_max_changes(direct_sym_indirect_judge_lags, lag_variable_coefficients)
 
@@ -143,6 +157,7 @@ def main():
   print()
 
 
-main()
+if (__name__ == "__main__"):
+  main()
 
 
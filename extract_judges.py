@@ -6,7 +6,13 @@
 import re
 import os
 import csv
+import codecs
+import hashlib
+import mmap
+import pickle
 from collections import OrderedDict
+from functools import lru_cache
+from multiprocessing import Pool
 
 from support.judge_countries import JUDGE_COUNTRIES
 
@@ -82,19 +88,29 @@ JUDGE_REPLACEMENTS = {
   "karim sandjabi": "sandjabi",
 }
 
-TITLE_REGEXES = [
-  re.compile(r"(^|\s)Judges?(\s|$)", re.IGNORECASE),
-  re.compile(r"(^|\s)Sir(\s|$)", re.IGNORECASE),
-  re.compile(r"(^|\s)(Acting )?Vice( |-)President(\s|$)", re.IGNORECASE),
-  re.compile(r"(^|\s)(Acting )?President(\s|$)", re.IGNORECASE),
-  re.compile(r"(^|\s)ad( |-)?hoc(\s|$)", re.IGNORECASE),
+TITLE_PHRASES = [
+  ["judge", "judges"],
+  ["sir"],
+  ["acting vice president", "acting vice-president", "vice president", "vice-president"],
+  ["acting president", "president"],
+  ["ad hoc", "ad-hoc", "adhoc"],
 ]
 
 DISSENTING_OPINION_REGEX = re.compile(r"(Joint )?Dissenting opinion (of|by) ([\w\.\s-]+?)$", re.IGNORECASE | re.MULTILINE | re.UNICODE)
+DISSENTING_HEADING_REGEX = re.compile(rb"Dissenting opinion (?:of|by) ", re.IGNORECASE)
 
 INPUT_DIRECTORY = "data/decisions/"
 AUTHORSHIP_FILE_NAME = "data/authorship.csv"
 JUDGES_FILE_NAME = "data/judges.csv"
+MANIFEST_FILE_NAME = "data/decision_manifest.pickle"
+
+INCREMENTAL = False
+MAPPED_SCANNING = True
+DECISION_ENCODING = "utf-8"
+PREAMBLE_WINDOW_SIZE = 1 << 16
+NUM_PROCESSES = 1
+NAME_CACHE_SIZE = 1 << 16
+HASH_BLOCK_SIZE = 1 << 20
 
 
 def load_decision(file_name):
@@ -103,15 +119,52 @@ def load_decision(file_name):
     data = input_file.read()
   return data
 
+def decode_decision(data, final = True):
+  decoded = codecs.getincrementaldecoder(DECISION_ENCODING)().decode(data, final = final)
+  return decoded.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def compile_title_trie(title_phrases):
+  trie = {}
+  for title_class, phrases in enumerate(title_phrases):
+    for phrase in phrases:
+      node = trie
+      for token in phrase.split(" "):
+        node = node.setdefault(token, {})
+      node[None] = title_class
+  return trie
+
+TITLE_TRIE = compile_title_trie(TITLE_PHRASES)
+
+def match_title(tokens, start, title_class):
+  node, end = TITLE_TRIE, None
+  for i in range(start, len(tokens)):
+    node = node.get(tokens[i])
+    if (node is None):
+      break
+    if (node.get(None) == title_class):
+      end = i + 1
+  return end
 
 def remove_titles(name):
   revised_name = " ".join(name.strip().strip(".").lower().replace(".", ". ").split())
-  revised_name = " ".join([token for token in revised_name.split(" ") if (not token.endswith("."))])
-  for title in TITLE_REGEXES:
-    revised_name = re.sub(title, " ", revised_name)
-  revised_name = " ".join([token for token in revised_name.split() if (token.replace(" ", ""))])
-  return revised_name.strip()
+  tokens = [token for token in revised_name.split(" ") if (not token.endswith("."))]
+
+  for title_class in range(len(TITLE_PHRASES)):
+    remaining, i = [], 0
+    while (i < len(tokens)):
+      end = match_title(tokens, i, title_class)
+      if (end is None):
+        remaining.append(tokens[i])
+        i += 1
+      else:
+        remaining += tokens[end:(end + 1)]
+        i = end + 1
+    tokens = remaining
 
+  return " ".join([token for token in tokens if (token)])
+
+@lru_cache(maxsize = NAME_CACHE_SIZE)
 def clean_name(name):
   cleaned = remove_titles(name.strip().lower())
   return JUDGE_REPLACEMENTS[cleaned] if (cleaned in JUDGE_REPLACEMENTS) else cleaned
@@ -121,16 +174,15 @@ def extract_names(judges):
   return {name for name in cleaned if (name)}
 
 
-def preamble_judges(decision):
+def parse_preamble(preamble):
   judges = set()
   ad_hoc = set()
   matched = set()
 
-  preamble = re.search(PREAMBLE_REGEX, decision).group(1).strip().splitlines()
-  preamble = [line.strip() for line in preamble]
-  preamble = [line for line in preamble if (line)]
+  for line in [line.strip() for line in preamble.strip().splitlines()]:
+    if (("judge" not in line.lower()) and ("president" not in line.lower())):
+      continue
 
-  for line in preamble:
     for office, pattern in PATTERNS.items():
       if ((office not in matched) and (not (("ad hoc" in line) and (office == "judges")))):
         matches = re.search(pattern, line)
@@ -150,32 +202,120 @@ def preamble_judges(decision):
 
   return (judges, ad_hoc)
 
+def preamble_judges(decision):
+  return parse_preamble(re.search(PREAMBLE_REGEX, decision).group(1))
+
+def mapped_preamble_judges(decision):
+  preamble = re.search(PREAMBLE_REGEX, decode_decision(decision[:PREAMBLE_WINDOW_SIZE], final = (len(decision) <= PREAMBLE_WINDOW_SIZE)))
+  if ((not preamble) and (len(decision) > PREAMBLE_WINDOW_SIZE)):
+    preamble = re.search(PREAMBLE_REGEX, decode_decision(decision[:]))
+  return parse_preamble(preamble.group(1))
+
 def dissenting_judges(decision):
   judges = set()
   for match in re.finditer(DISSENTING_OPINION_REGEX, decision):
     judges |= extract_names(match.group(3))
   return judges
 
-def determine_judges(decision):
-  judges, ad_hoc = preamble_judges(decision)
+def find_dissenting_windows(decision):
+  windows = []
+  for heading in re.finditer(DISSENTING_HEADING_REGEX, decision):
+    start = decision.rfind(b"\n", 0, heading.start()) + 1
+    end = decision.find(b"\n", heading.end())
+    end = decision.find(b"\n", end + 1) if (end >= 0) else -1
+    end = end if (end >= 0) else len(decision)
+
+    if ((windows) and (start < windows[-1][1])):
+      windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+    else:
+      windows.append((start, end))
+  return windows
+
+def mapped_dissenting_judges(decision):
+  judges = set()
+  for start, end in find_dissenting_windows(decision):
+    judges |= dissenting_judges(decode_decision(decision[start:end]))
+  return judges
+
+def weigh_judges(judges, ad_hoc, dissenters):
   judge_weights = {judge: 1 for judge in judges}
   judge_weights.update({judge: 1 for judge in ad_hoc})
 
-  for judge in dissenting_judges(decision):
+  for judge in dissenters:
     if (judge in judge_weights):
       judge_weights[judge] = -1
 
   return {j: (w, (j in ad_hoc)) for j, w in judge_weights.items()}
 
+def determine_judges(decision):
+  return weigh_judges(*preamble_judges(decision), dissenting_judges(decision))
+
+def determine_mapped_judges(decision):
+  return weigh_judges(*mapped_preamble_judges(decision), mapped_dissenting_judges(decision))
+
+
+def hash_file(file_name):
+  digest = hashlib.sha1()
+  with open(file_name, "rb") as input_file:
+    for block in iter(lambda: input_file.read(HASH_BLOCK_SIZE), b""):
+      digest.update(block)
+  return digest.hexdigest()
+
+def load_manifest(file_name):
+  if ((not file_name) or (not os.path.exists(file_name))):
+    return {}
+  with open(file_name, "rb") as manifest_file:
+    manifest = pickle.load(manifest_file)
+  return manifest["files"] if (manifest["parser"] == hash_file(__file__)) else {}
+
+def write_manifest(file_name, file_entries):
+  with open(file_name + ".%d" % (os.getpid(),), "wb") as manifest_file:
+    pickle.dump({"parser": hash_file(__file__), "files": file_entries}, manifest_file)
+  os.replace(file_name + ".%d" % (os.getpid(),), file_name)
+
+
+def extract_decision_judges(file_name):
+  if ((not MAPPED_SCANNING) or (os.path.getsize(file_name) == 0)):
+    return determine_judges(load_decision(file_name))
+
+  with open(file_name, "rb") as input_file:
+    with mmap.mmap(input_file.fileno(), 0, access = mmap.ACCESS_READ) as decision:
+      return determine_mapped_judges(decision)
+
+def map_decisions(paths, num_processes = 1):
+  if ((num_processes > 1) and (len(paths) > 1)):
+    with Pool(num_processes) as pool:
+      return pool.map(extract_decision_judges, paths, chunksize = max(1, len(paths) // (4 * num_processes)))
+  return [extract_decision_judges(path) for path in paths]
+
+def retrieve_judges(directory, num_processes = 1, manifest_file_name = None):
+  file_names = sorted([file_name for file_name in os.listdir(directory) if (file_name.endswith(".txt"))])
+  manifest = load_manifest(manifest_file_name)
+  file_entries = {}
+
+  for file_name in file_names:
+    path = os.path.join(directory, file_name)
+    status = os.stat(path)
+    entry = {"path": path, "size": status.st_size, "mtime": status.st_mtime_ns, "hash": None, "judges": None}
+    cached = manifest.get(file_name)
+
+    if ((cached) and (cached["size"] == entry["size"]) and (cached["mtime"] == entry["mtime"])):
+      entry = dict(cached, path = path)
+    elif (manifest_file_name):
+      entry["hash"] = hash_file(path)
+      if ((cached) and (cached["hash"] == entry["hash"])):
+        entry["judges"] = cached["judges"]
+
+    file_entries[file_name] = entry
+
+  stale_file_names = [file_name for file_name, entry in file_entries.items() if (entry["judges"] is None)]
+  for file_name, judges in zip(stale_file_names, map_decisions([file_entries[f]["path"] for f in stale_file_names], num_processes = num_processes)):
+    file_entries[file_name]["judges"] = judges
+
+  if (manifest_file_name):
+    write_manifest(manifest_file_name, file_entries)
 
-def retrieve_judges(directory):
-  decision_judges = {}
-  for file_name in os.listdir(directory):
-    if (file_name.endswith(".txt")):
-      id = file_name[:-4]
-      decision = load_decision(os.path.join(directory, file_name))
-      decision_judges[id] = determine_judges(decision)
-  return decision_judges
+  return {file_name[:-4]: entry["judges"] for file_name, entry in file_entries.items()}
 
 
 def number_judges(decision_judges):
@@ -216,12 +356,13 @@ def output_judge_attributes(file_name, judge_attributes):
 
 
 def main():
-  decision_judges = retrieve_judges(INPUT_DIRECTORY)
+  decision_judges = retrieve_judges(INPUT_DIRECTORY, num_processes = NUM_PROCESSES, manifest_file_name = (MANIFEST_FILE_NAME if (INCREMENTAL) else None))
   judge_attributes, authorship = number_judges(decision_judges)
   output_authorship(AUTHORSHIP_FILE_NAME, authorship)
   output_judge_attributes(JUDGES_FILE_NAME, judge_attributes)
 
 
-main()
+if (__name__ == "__main__"):
+  main()
 
 
@@ -4,51 +4,58 @@
 
 
 import csv
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
 
 from statsmodels.tsa.stattools import adfuller
 
-from support.regression import load_node_year_variables
-
 
 DECISION_VARIABLES_FILE_NAME = "data/decision_variables.csv"
 DIRECT_JUDGE_VARIABLES_FILE_NAME = "data/judge_variables/direct_judge_variables.csv"
+DECISION_ADF_FILE_NAME = "data/decision_adf_results.csv"
+JUDGE_ADF_FILE_NAME = "data/judge_adf_results.csv"
 
 DEPENDENT_VARIABLES = ["citations_next_year", "citations_next_5_years", "citations_next_10_years"]
+NUM_PROCESSES = 1
 
 
 def load_dependent_node_values(file_name, node_column, dependent_variables):
   dependent_node_values = {}
-  dependent_node_year_values = {dependent_variable: {} for dependent_variable in dependent_variables}
-
-  with open(file_name, "r") as input_file:
-    for row in csv.DictReader(input_file):
-      for dependent_variable in dependent_variables:
-        if (row[dependent_variable]):
-          if (row[node_column] in dependent_node_year_values[dependent_variable]):
-            dependent_node_year_values[dependent_variable][row[node_column]][int(row["year"])] = float(row[dependent_variable])
-          else:
-            dependent_node_year_values[dependent_variable][row[node_column]] = {int(row["year"]): float(row[dependent_variable])}
-
-  for dependent_variable, node_year_values in dependent_node_year_values.items():
-    dependent_node_values[dependent_variable] = {}
-    for node, year_values in node_year_values.items():
-       dependent_node_values[dependent_variable][node] = [year_values[year] for year in sorted(year_values.keys())]
+
+  node_years = pd.read_csv(file_name, usecols = [node_column, "year"] + dependent_variables, dtype = {node_column: str})
+
+  for dependent_variable in dependent_variables:
+    node_values = node_years.loc[node_years[dependent_variable].notna(), [node_column, "year", dependent_variable]]
+    node_codes, nodes = pd.factorize(node_values[node_column])
+    rows = np.lexsort((node_values["year"].values, node_codes))
+    starts = np.flatnonzero(np.diff(node_codes[rows], prepend = -1))
+    values = np.split(node_values[dependent_variable].values[rows].astype(float), starts[1:])
+    dependent_node_values[dependent_variable] = dict(zip(nodes, values))
 
   return dependent_node_values
 
 
-def run_dependent_node_adf(dependent_node_values):
+def run_node_adf(values):
+  return tuple(adfuller(values, maxlag = None, autolag = "AIC")[1: 3])
+
+def run_dependent_node_adf(dependent_node_values, num_processes = 1):
   dependent_node_adrs = {dependent_variable: {} for dependent_variable in dependent_node_values.keys()}
   dependent_nonoptimal_nodes = {dependent_variable: set() for dependent_variable in dependent_node_values.keys()}
   dependent_node_counts = {dependent_variable: 0 for dependent_variable in dependent_node_values.keys()}
-  for dependent_variable, node_values in dependent_node_values.items():
-    for node, values in node_values.items():
-      if (len(values) > 3):
-        p_value, lag = adfuller(values, maxlag = None, autolag = "AIC")[1: 3]
-        dependent_node_adrs[dependent_variable][node] = (p_value, lag)
-        if ((p_value < 0.05) and (lag > 1)):
-          dependent_nonoptimal_nodes[dependent_variable].add(node)
-        dependent_node_counts[dependent_variable] += 1
+
+  tests = [(dependent_variable, node, values) for dependent_variable, node_values in dependent_node_values.items() for node, values in node_values.items() if (len(values) > 3)]
+  if ((num_processes > 1) and (len(tests) > 1)):
+    with Pool(num_processes) as pool:
+      adrs = pool.map(run_node_adf, [values for _, _, values in tests], chunksize = max(1, len(tests) // (4 * num_processes)))
+  else:
+    adrs = [run_node_adf(values) for _, _, values in tests]
+
+  for (dependent_variable, node, _), (p_value, lag) in zip(tests, adrs):
+    dependent_node_adrs[dependent_variable][node] = (p_value, lag)
+    if ((p_value < 0.05) and (lag > 1)):
+      dependent_nonoptimal_nodes[dependent_variable].add(node)
+    dependent_node_counts[dependent_variable] += 1
   return dependent_node_adrs, dependent_nonoptimal_nodes, dependent_node_counts
 
 def calculate_dependent_ratios(dependent_nonoptimal_nodes, dependent_node_counts):
@@ -58,6 +65,22 @@ def calculate_dependent_ratios(dependent_nonoptimal_nodes, dependent_node_counts
   return dependent_ratios
 
 
+def write_dependent_node_adrs(file_name, node_class, dependent_node_adrs, dependent_nonoptimal_nodes, dependent_ratios):
+  with open(file_name, "w") as output_file:
+    writer = csv.DictWriter(output_file, fieldnames = ["dependent_variable", node_class, "adf_p-value", "adf_lag", "nonoptimal", "dependent_nonoptimal_ratio"])
+    writer.writeheader()
+
+    for dependent_variable, node_adrs in dependent_node_adrs.items():
+      for node, (p_value, lag) in node_adrs.items():
+        writer.writerow({
+          "dependent_variable": dependent_variable,
+          node_class: node,
+          "adf_p-value": p_value,
+          "adf_lag": lag,
+          "nonoptimal": node in dependent_nonoptimal_nodes[dependent_variable],
+          "dependent_nonoptimal_ratio": dependent_ratios[dependent_variable],
+        })
+
 def print_dependent_ratios(dependent_ratios):
   for dependent_variable, ratio in dependent_ratios.items():
     print(dependent_variable, ratio)
@@ -65,10 +88,14 @@ def print_dependent_ratios(dependent_ratios):
 
 def main():
   dependent_nodes_values = load_dependent_node_values(DECISION_VARIABLES_FILE_NAME, "decision", DEPENDENT_VARIABLES)
-  decision_ratios = calculate_dependent_ratios(*run_dependent_node_adf(dependent_nodes_values)[1:])
+  decision_adrs, decision_nonoptimal_nodes, decision_counts = run_dependent_node_adf(dependent_nodes_values, num_processes = NUM_PROCESSES)
+  decision_ratios = calculate_dependent_ratios(decision_nonoptimal_nodes, decision_counts)
+  write_dependent_node_adrs(DECISION_ADF_FILE_NAME, "decision", decision_adrs, decision_nonoptimal_nodes, decision_ratios)
 
   dependent_nodes_values = load_dependent_node_values(DIRECT_JUDGE_VARIABLES_FILE_NAME, "judge", DEPENDENT_VARIABLES)
-  judge_ratios = calculate_dependent_ratios(*run_dependent_node_adf(dependent_nodes_values)[1:])
+  judge_adrs, judge_nonoptimal_nodes, judge_counts = run_dependent_node_adf(dependent_nodes_values, num_processes = NUM_PROCESSES)
+  judge_ratios = calculate_dependent_ratios(judge_nonoptimal_nodes, judge_counts)
+  write_dependent_node_adrs(JUDGE_ADF_FILE_NAME, "judge", judge_adrs, judge_nonoptimal_nodes, judge_ratios)
 
   print()
   print("=== DECISIONS ===")
@@ -81,6 +108,7 @@ def main():
   print()
 
 
-main()
+if (__name__ == "__main__"):
+  main()
 
 
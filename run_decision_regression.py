@@ -12,6 +12,7 @@ COEFFICIENTS_FILE_NAME = "data/decision_model_coefficients.csv"
 INDEX = ("decision", "year")
 TIME_VARIABLE = "current_year"
 CONTROL_VARIABLES = {"age", "age_squared", "type", "current_year"}
+NUM_PROCESSES = 1
 
 DEPENDENT_VARIABLES = ["citations_next_year", "citations_next_5_years", "citations_next_10_years"]
 INDEPENDENT_VARIABLES = [
@@ -25,10 +26,11 @@ INDEPENDENT_VARIABLES = [
 
 def main():
   decision_year_variables = load_node_year_variables(INPUT_FILE_NAME, INDEX)
-  variable_coefficients = generate_variable_coefficients(decision_year_variables, INDEPENDENT_VARIABLES, DEPENDENT_VARIABLES, CONTROL_VARIABLES, dependent_lags = {1,})
+  variable_coefficients = generate_variable_coefficients(decision_year_variables, INDEPENDENT_VARIABLES, DEPENDENT_VARIABLES, CONTROL_VARIABLES, dependent_lags = {1,}, num_processes = NUM_PROCESSES)
   write_variable_coefficients(COEFFICIENTS_FILE_NAME, variable_coefficients)
 
 
-main()
+if (__name__ == "__main__"):
+  main()
 
 
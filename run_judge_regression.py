@@ -23,6 +23,7 @@ TIME_VARIABLE = "current_year"
 
 CONTROL_VARIABLES = {"seniority", "seniority_squared", "current_year", "num_votes_this_year", "ad_hoc_this_year"}
 OFFSET_VARIABLE = "supported_decisions"
+NUM_PROCESSES = 1
 
 DEPENDENT_VARIABLES = ["citations_next_year", "citations_next_5_years", "citations_next_10_years"]
 ASYMMETRIC_INDEPENDENT_VARIABLES = [
@@ -50,10 +51,11 @@ def main():
     judge_year_variables = load_node_year_variables(generate_input_file_name(network_type), INDEX)
     independent_variables = SYMMETRIC_INDEPENDENT_VARIABLES if (network_type in SYMMETRIC_NETWORKS) else ASYMMETRIC_INDEPENDENT_VARIABLES
 
-    variable_coefficients = generate_variable_coefficients(judge_year_variables, independent_variables, DEPENDENT_VARIABLES, CONTROL_VARIABLES, offset_variable = OFFSET_VARIABLE, dependent_lags = {1,})
+    variable_coefficients = generate_variable_coefficients(judge_year_variables, independent_variables, DEPENDENT_VARIABLES, CONTROL_VARIABLES, offset_variable = OFFSET_VARIABLE, dependent_lags = {1,}, num_processes = NUM_PROCESSES)
     write_variable_coefficients(generate_coefficients_file_name(network_type), variable_coefficients)
 
 
-main()
+if (__name__ == "__main__"):
+  main()
 
 
@@ -3,33 +3,86 @@
 # 4 May 2020
 
 
-from support.graph_processing import extract_subgraph, binarize_graph, remove_self_loops, multiply_graphs, add_graphs
+from support.graph_processing import extract_subgraph, order_nodes, adjacency_matrix, binarize_matrix, remove_matrix_diagonal, symmetrize_matrix, multiply_matrices, add_matrices, matrix_to_graph
 
 
 DECISION_FILTER = lambda n, a: (not n.startswith("j"))
 
+AGREEMENT_COMPONENTS = {
+  "direct": ["direct"],
+  "indirect": ["indirect"],
+  "symmetric_indirect": ["symmetric_indirect"],
+  "direct_and_indirect": ["direct", "indirect"],
+  "direct_and_symmetric_indirect": ["direct", "symmetric_indirect"],
+}
 
-def compute_direct_agreement(citation_graph, vote_graph, year):
+
+def generate_vote_matrix(vote_graph, year):
   vote_subgraph = extract_subgraph(vote_graph, year)
-  return remove_self_loops(multiply_graphs(vote_subgraph, vote_subgraph.reverse(), DECISION_FILTER))
+  judges = [n for n, a in vote_subgraph.nodes(data = True) if (not DECISION_FILTER(n, a))]
+  decisions = order_nodes(vote_subgraph, DECISION_FILTER)
+  return (vote_subgraph, judges, decisions, adjacency_matrix(vote_subgraph, judges, decisions))
+
+def generate_citation_matrix(citation_graph, decisions, year):
+  return binarize_matrix(adjacency_matrix(extract_subgraph(citation_graph, year), decisions, decisions))
+
+
+def compute_direct_matrix(votes):
+  return remove_matrix_diagonal(multiply_matrices(votes, votes.T))
+
+def compute_indirect_matrix(votes, citations):
+  return remove_matrix_diagonal(multiply_matrices(multiply_matrices(votes, binarize_matrix(citations)), votes.T))
+
+
+def compute_direct_agreement(citation_graph, vote_graph, year):
+  vote_subgraph, judges, _, votes = generate_vote_matrix(vote_graph, year)
+  return matrix_to_graph(compute_direct_matrix(votes), judges, vote_subgraph)
 
 def compute_indirect_agreement(citation_graph, vote_graph, year):
-  vote_subgraph = extract_subgraph(vote_graph, year)
-  citation_subgraph = binarize_graph(extract_subgraph(citation_graph, year))
-  indirect_agreement = multiply_graphs(vote_subgraph, citation_subgraph, DECISION_FILTER)
-  return remove_self_loops(multiply_graphs(indirect_agreement, vote_subgraph.reverse(), DECISION_FILTER))
+  vote_subgraph, judges, decisions, votes = generate_vote_matrix(vote_graph, year)
+  citations = generate_citation_matrix(citation_graph, decisions, year)
+  return matrix_to_graph(compute_indirect_matrix(votes, citations), judges, vote_subgraph)
 
 def compute_symmetric_indirect_agreement(citation_graph, vote_graph, year):
-  undirected_citation_graph = binarize_graph(add_graphs(citation_graph, citation_graph.reverse()))
-  return remove_self_loops(compute_indirect_agreement(undirected_citation_graph, vote_graph, year))
+  vote_subgraph, judges, decisions, votes = generate_vote_matrix(vote_graph, year)
+  citations = symmetrize_matrix(generate_citation_matrix(citation_graph, decisions, year))
+  return matrix_to_graph(compute_indirect_matrix(votes, citations), judges, vote_subgraph)
 
 def compute_direct_and_indirect_agreement(citation_graph, vote_graph, year):
-  direct_agreement = compute_direct_agreement(citation_graph, vote_graph, year)
-  indirect_agreement = compute_indirect_agreement(citation_graph, vote_graph, year)
-  return remove_self_loops(add_graphs(direct_agreement, indirect_agreement))
+  vote_subgraph, judges, decisions, votes = generate_vote_matrix(vote_graph, year)
+  citations = generate_citation_matrix(citation_graph, decisions, year)
+  weights, structure = add_matrices(compute_direct_matrix(votes), compute_indirect_matrix(votes, citations))
+  return matrix_to_graph(weights, judges, vote_subgraph, structure = structure)
 
 def compute_direct_and_symmetric_indirect_agreement(citation_graph, vote_graph, year):
-  direct_agreement = compute_direct_agreement(citation_graph, vote_graph, year)
-  symmetric_indirect_agreement = compute_symmetric_indirect_agreement(citation_graph, vote_graph, year)
-  return remove_self_loops(add_graphs(direct_agreement, symmetric_indirect_agreement))
+  vote_subgraph, judges, decisions, votes = generate_vote_matrix(vote_graph, year)
+  citations = symmetrize_matrix(generate_citation_matrix(citation_graph, decisions, year))
+  weights, structure = add_matrices(compute_direct_matrix(votes), compute_indirect_matrix(votes, citations))
+  return matrix_to_graph(weights, judges, vote_subgraph, structure = structure)
+
+
+def compute_agreements(citation_graph, vote_graph, year, network_types):
+  agreements = {}
+  vote_subgraph, judges, decisions, votes = generate_vote_matrix(vote_graph, year)
+  components = {c for t in network_types for c in AGREEMENT_COMPONENTS[t]}
+
+  component_matrices = {}
+  if ("direct" in components):
+    component_matrices["direct"] = compute_direct_matrix(votes)
+  if (components & {"indirect", "symmetric_indirect"}):
+    citations = generate_citation_matrix(citation_graph, decisions, year)
+    if ("indirect" in components):
+      component_matrices["indirect"] = compute_indirect_matrix(votes, citations)
+    if ("symmetric_indirect" in components):
+      component_matrices["symmetric_indirect"] = compute_indirect_matrix(votes, symmetrize_matrix(citations))
+
+  for network_type in network_types:
+    matrices = [component_matrices[c] for c in AGREEMENT_COMPONENTS[network_type]]
+    if (len(matrices) > 1):
+      weights, structure = add_matrices(*matrices)
+      agreements[network_type] = matrix_to_graph(weights, judges, vote_subgraph, structure = structure)
+    else:
+      agreements[network_type] = matrix_to_graph(matrices[0], judges, vote_subgraph)
+
+  return agreements
 
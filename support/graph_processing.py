@@ -3,20 +3,68 @@
 # 23 April 2020
 
 
+from weakref import WeakKeyDictionary
+
+import numpy as np
 import networkx as nx
+from scipy.sparse import csr_matrix
 from networkx.algorithms.bipartite.matrix import biadjacency_matrix
 
 
+YEAR_INDICES = WeakKeyDictionary()
+YEAR_SUBGRAPHS = WeakKeyDictionary()
+
+
 def load_graph(file_name):
   return nx.read_graphml(file_name)
 
 
+def index_years(graph):
+  nodes = sorted(graph.nodes(data = "year"), key = lambda n: n[1])
+  edges = sorted(graph.edges(data = "year"), key = lambda e: e[2])
+  return {
+    "size": (graph.number_of_nodes(), graph.number_of_edges()),
+    "node_years": np.array([y for _, y in nodes]),
+    "node_ranks": {n: i for i, (n, _) in enumerate(nodes)},
+    "edge_years": np.array([y for _, _, y in edges]),
+    "edge_ranks": {(s, t): i for i, (s, t, _) in enumerate(edges)},
+  }
+
+def load_year_index(graph):
+  if ((graph not in YEAR_INDICES) or (YEAR_INDICES[graph]["size"] != (graph.number_of_nodes(), graph.number_of_edges()))):
+    YEAR_INDICES[graph] = index_years(graph)
+  return YEAR_INDICES[graph]
+
 def extract_subgraph(graph, year):
-  subgraph = nx.DiGraph()
-  subgraph.add_nodes_from([(n, dict(a)) for n, a in graph.nodes(data = True) if (a["year"] <= year)])
-  subgraph.add_edges_from([(s, t, dict(a)) for s, t, a in graph.edges(data = True) if (a["year"] <= year)])
+  if (graph in YEAR_SUBGRAPHS):
+    graph, graph_year = YEAR_SUBGRAPHS[graph]
+    year = min(year, graph_year)
+
+  year_index = load_year_index(graph)
+  node_ranks, edge_ranks = year_index["node_ranks"], year_index["edge_ranks"]
+  node_cutoff = int(np.searchsorted(year_index["node_years"], year, side = "right"))
+  edge_cutoff = int(np.searchsorted(year_index["edge_years"], year, side = "right"))
+
+  subgraph = nx.subgraph_view(graph, filter_node = lambda n: (node_ranks[n] < node_cutoff), filter_edge = lambda s, t: (edge_ranks[(s, t)] < edge_cutoff))
+  YEAR_SUBGRAPHS[subgraph] = (graph, year)
   return subgraph
 
+def group_by_year(graph):
+  year_nodes = {}
+  year_edges = {}
+  for n, a in graph.nodes(data = True):
+    year_nodes.setdefault(a["year"], []).append((n, a))
+  for s, t, a in graph.edges(data = True):
+    year_edges.setdefault(a["year"], []).append((s, t, a))
+  return (year_nodes, year_edges)
+
+def extend_subgraph(subgraph, year_nodes, year_edges, start_year, end_year):
+  added_nodes = [(n, dict(a)) for y in sorted(year_nodes.keys()) if (((start_year is None) or (y > start_year)) and (y <= end_year)) for n, a in year_nodes[y]]
+  added_edges = [(s, t, dict(a)) for y in sorted(year_edges.keys()) if (((start_year is None) or (y > start_year)) and (y <= end_year)) for s, t, a in year_edges[y]]
+  subgraph.add_nodes_from(added_nodes)
+  subgraph.add_edges_from(added_edges)
+  return {n for n, _ in added_nodes} | {s for s, _, _ in added_edges}
+
 def binarize_graph(graph):
   binarized = graph.copy()
   for u, v in binarized.edges():
@@ -117,6 +165,37 @@ def add_graphs(graph_a, graph_b):
   return result
 
 
+def binarize_matrix(matrix):
+  return (matrix != 0).astype(float).tocsr()
+
+def remove_matrix_diagonal(matrix):
+  entries = matrix.tocoo()
+  off_diagonal = (entries.row != entries.col)
+  return csr_matrix((entries.data[off_diagonal], (entries.row[off_diagonal], entries.col[off_diagonal])), shape = matrix.shape)
+
+def symmetrize_matrix(matrix):
+  return binarize_matrix(matrix + matrix.T)
+
+def multiply_matrices(matrix_a, matrix_b):
+  product = (matrix_a * matrix_b).tocsr()
+  product.eliminate_zeros()
+  return product
+
+def add_matrices(matrix_a, matrix_b):
+  return ((matrix_a + matrix_b).tocsr(), binarize_matrix(binarize_matrix(matrix_a) + binarize_matrix(matrix_b)))
+
+def matrix_to_graph(matrix, nodes, node_graph, structure = None):
+  graph = nx.DiGraph()
+  graph.add_nodes_from([(n, dict(node_graph.nodes[n])) for n in nodes])
+
+  entries = (structure if (structure is not None) else matrix).tocoo()
+  weights = np.asarray(matrix[entries.row, entries.col]).flatten() if (structure is not None) else entries.data
+  labels = np.array(nodes, dtype = object)
+  graph.add_weighted_edges_from(zip(labels[entries.row], labels[entries.col], weights.astype(float).tolist()))
+
+  return graph
+
+
 def write_graph(file_name, graph):
   nx.write_graphml(graph, file_name)
 
@@ -4,111 +4,219 @@
 
 
 import csv
+import hashlib
+import os
+import pickle
+from multiprocessing import get_context
 import numpy as np
 import pandas as pd
 from statistics import stdev, mean
+import statsmodels
 import statsmodels.api as sm
 import statsmodels.formula.api as smf
-from scipy.stats.mstats import zscore
+from patsy import build_design_matrices
+from scipy.stats import norm
 from statsmodels.stats.outliers_influence import variance_inflation_factor
 
-import rpy2.robjects as ro
-from rpy2.robjects.packages import importr
-from rpy2.robjects import pandas2ri
-from rpy2.robjects.conversion import localconverter
-import rpy2.robjects.conversion as cv
-
-importr("glm2")
-importr("MASS")
-importr("lmtest")
-importr("sandwich")
-importr("margins")
-importr("AER")
-importr("Metrics")
-importr("bbmle")
-
 from support.variable_computation import generate_lagged_variable_name
 
 
 AME_RANGE_SD = 1.0
 
-NONE_CONVERTER = cv.Converter("None converter")
-NONE_CONVERTER.py2rpy.register(type(None), lambda _: ro.r("NULL"))
+REGRESSION_BACKEND = "r"
+R_PACKAGES = ["glm2", "MASS", "lmtest", "sandwich", "margins", "AER", "Metrics", "bbmle"]
+FIT_CACHE_DIRECTORY = "data/model_cache/"
+
+R_DATA_FRAME_CACHE_SIZE = 4
+
+SELECT_DATA_FUNCTION = """
+  function(data, rows, columns, means, deviations, offset_variable) {
+    data <- data[rows, columns, drop = FALSE]
+    for (column in names(means)) {
+      data[[column]] <- (data[[column]] - means[[column]]) / deviations[[column]]
+    }
+    if ((!is.null(offset_variable)) && any(data[[offset_variable]] == 0)) {
+      data[[offset_variable]] <- data[[offset_variable]] + 0.01
+    }
+    return(data)
+  }
+"""
+
+FIT_MODEL_FUNCTION = """
+  function(data, formula, variables, ame_change, dependent_variable, start_values) {
+    options(warn = 1)
+    formula <- as.formula(formula)
+
+    start <- NULL
+    if (!is.null(start_values)) {
+      coefficient_names <- colnames(model.matrix(formula, data = data))
+      start <- start_values[coefficient_names]
+      start[is.na(start)] <- start_values[sub("TRUE$", "", coefficient_names[is.na(start)])]
+      start[is.na(start)] <- 0
+      start <- unname(start)
+    }
+
+    poisson_model <- glm(formula, data = data, family = poisson(link = "log"), start = start)
+    dispersion <- dispersiontest(poisson_model, trafo = 1)
+    dispersion_p <- dispersion$p.value
+    dispersion_alpha <- dispersion$estimate
+
+    model <- glm(formula, data = data, family = quasipoisson(link = "log"), start = start)
+    dispersion = sum((model$weights * model$residuals^2)[model$weights > 0])/model$df.residual
+
+    vcov <- vcovHC(model, type = "HC3")
+    coefficients <- coeftest(model, vcov. = vcov)
+    confidence_intervals <- coefci(model, level = 0.95, vcov. = vcov)
+    marg_effects <- summary(margins(model, data = data, vcov = vcov, level = 0.95, variables = variables, change = ame_change))
+
+    fit_rmse <- rmse(data[[dependent_variable]], predict(model, newdata = data, type = "response"))
+    qaic <- qAIC(poisson_model, dispersion=dispersion, nobs=length(data))
+
+    return(list(row.names(coefficients), coefficients, confidence_intervals, marg_effects, dispersion_p, dispersion_alpha, fit_rmse, qaic))
+  }
+"""
+
+R_STATE = {}
+R_DATA_FRAMES = {}
+WORKER_STATE = {}
 
 
 def load_node_year_variables(file_name, index):
   return pd.read_csv(file_name, index_col = index)
 
 
-def remove_variables(decision_year_variables, keep):
-  remove = {v for v in decision_year_variables.columns if (v not in keep)}
-  removed = decision_year_variables.drop(columns = remove)
-  return removed.dropna()
+def compute_variable_collinearities(data):
+  numeric_data = data.select_dtypes(include = ["number"])
+  values = numeric_data.to_numpy(dtype = float)
+  products = values.T.dot(values)
+  norms = np.sqrt(np.diag(products))
 
-def standardize_variables(data, variables):
-  standardized = data.copy()
-  means = {}
-  deviations = {}
+  try:
+    vifs = np.diag(np.linalg.inv(products / np.outer(norms, norms)))
+  except np.linalg.LinAlgError:
+    vifs = [variance_inflation_factor(values, v) for v in range(values.shape[1])]
 
-  for variable in variables:
-    if (np.issubdtype(standardized[variable].dtype, np.number)):
-      variable_data = list(standardized[variable])
-      standardized[variable] = zscore(variable_data)
-      means[variable] = np.mean(variable_data)
-      deviations[variable] = np.std(variable_data)
+  return {variable: float(vif) for variable, vif in zip(numeric_data.columns, vifs)}
 
-  return (standardized, means, deviations)
-
-def compute_variable_collinearities(data):
-  variable_vifs = {}
-  numeric_data = data.select_dtypes(include = ["number"])
-  for v, variable in enumerate(numeric_data.columns):
-    variable_vifs[variable] = variance_inflation_factor(numeric_data.values, v)
-  return variable_vifs
+def load_variable_collinearities(base_variables, variables):
+  columns = sorted(variables)
+  rows = ~base_variables["missing"][:, [base_variables["columns"][c] for c in columns]].any(axis = 1)
+  return compute_variable_collinearities(base_variables["data"].loc[rows, columns])
 
 def prepare_offset(data, variable):
   if ((variable) and (data[variable] == 0).any()):
     data[variable] += 0.01
 
 
-def fit_glm(data, independent_variables, dependent_variable, offset_variable):
-  model_results = {"num_data": data.shape[0], "dependent_std_dev": float(stdev(data[dependent_variable].tolist())), "dependent_mean": float(mean(data[dependent_variable].tolist()))}
-  variable_results = {}
-
+def hash_frame(data):
+  digest = hashlib.sha1()
+  digest.update(repr([(str(c), str(t)) for c, t in data.dtypes.items()]).encode())
+  digest.update(pd.util.hash_pandas_object(data, index = True).values.tobytes())
+  return digest.hexdigest()
+
+def initialize_r():
+  if ("robjects" not in R_STATE):
+    import rpy2.robjects as ro
+    from rpy2.robjects.packages import importr
+    from rpy2.robjects import pandas2ri
+    import rpy2.robjects.conversion as cv
+
+    for package in R_PACKAGES:
+      importr(package)
+
+    none_converter = cv.Converter("None converter")
+    none_converter.py2rpy.register(type(None), lambda _: ro.r("NULL"))
+
+    R_STATE["robjects"] = ro
+    R_STATE["converter"] = ro.default_converter + pandas2ri.converter + none_converter
+    R_STATE["fit_model"] = ro.r(FIT_MODEL_FUNCTION)
+    R_STATE["select_data"] = ro.r(SELECT_DATA_FUNCTION)
+  return R_STATE["robjects"]
+
+def fill_object_columns(data):
+  filled = data.copy()
+  for column in data.columns[(data.dtypes == object) & data.isna().any().values]:
+    present = data[column].dropna()
+    if (len(present) > 0):
+      filled[column] = data[column].where(data[column].notna(), present.iloc[0]).astype(object)
+  return filled
+
+def load_r_base_data(base_variables):
+  if ("hash" not in base_variables):
+    base_variables["hash"] = hash_frame(base_variables["data"])
+  if (base_variables["hash"] not in R_DATA_FRAMES):
+    if (len(R_DATA_FRAMES) >= R_DATA_FRAME_CACHE_SIZE):
+      del R_DATA_FRAMES[next(iter(R_DATA_FRAMES))]
+    R_DATA_FRAMES[base_variables["hash"]] = initialize_r().conversion.py2rpy(fill_object_columns(base_variables["data"]))
+  return R_DATA_FRAMES[base_variables["hash"]]
+
+def load_r_data(data, offset_variable, base_selection = None):
+  ro = initialize_r()
+  if ((base_selection is None) or (not base_selection["base_variables"]["data"].index.is_unique)):
+    return ro.conversion.py2rpy(data)
+
+  rows = base_selection["base_variables"]["data"].index.get_indexer(data.index) + 1
+  means, deviations = ro.FloatVector(list(base_selection["means"].values())), ro.FloatVector(list(base_selection["deviations"].values()))
+  means.names, deviations.names = ro.StrVector(list(base_selection["means"].keys())), ro.StrVector(list(base_selection["deviations"].keys()))
+  return R_STATE["select_data"](load_r_base_data(base_selection["base_variables"]), ro.IntVector(rows.tolist()), ro.StrVector([str(c) for c in data.columns]), means, deviations, offset_variable)
+
+
+def load_r_versions():
+  if ("versions" not in R_STATE):
+    ro = initialize_r()
+    R_STATE["versions"] = [str(ro.r("R.version.string")[0])] + [("%s %s" % (p, ro.r("as.character(packageVersion(\"%s\"))" % (p,))[0])) for p in R_PACKAGES]
+  return R_STATE["versions"]
+
+def load_backend_versions(backend):
+  return load_r_versions() if (backend == "r") else ["statsmodels %s" % (statsmodels.__version__,), "numpy %s" % (np.__version__,)]
+
+def generate_formula(independent_variables, dependent_variable, offset_variable):
   formula_offset = str(dependent_variable) + " ~ " + (" + ".join(independent_variables))
   if (offset_variable):
     formula_offset += " + offset(log(%s))" % (offset_variable)
-  variables = "c(" + ", ".join([("\"%s\"" % (v)) for v in independent_variables if (not v.startswith("lagged_"))]) + ")"
-  ame_half = float(AME_RANGE_SD) / 2.0
-  ame_change = "c(" + str(-ame_half) + ", " + str(ame_half) + ")"
+  return formula_offset
 
-  with localconverter(ro.default_converter + pandas2ri.converter + NONE_CONVERTER):
-    r_code = """
-      fit_model <- function(data) {{
-        options(warn = 1)
+def generate_cache_file_name(data, independent_variables, dependent_variable, offset_variable):
+  digest = hashlib.sha1()
+  digest.update(hash_frame(data).encode())
+  digest.update(repr((generate_formula(independent_variables, dependent_variable, offset_variable), offset_variable, AME_RANGE_SD, REGRESSION_BACKEND, load_backend_versions(REGRESSION_BACKEND))).encode())
+  return os.path.join(FIT_CACHE_DIRECTORY, digest.hexdigest() + ".pickle")
 
-        dispersion <- dispersiontest(glm({formula_offset}, data = data, family = poisson), trafo = 1)
-        dispersion_p <- dispersion$p.value
-        dispersion_alpha <- dispersion$estimate
 
-        model <- glm({formula_offset}, data = data, family = quasipoisson(link = "log"))
-        dispersion = sum((model$weights * model$residuals^2)[model$weights > 0])/model$df.residual
+def fit_glm(data, independent_variables, dependent_variable, offset_variable, start_coefficients = None, base_selection = None):
+  cache_file_name = generate_cache_file_name(data, independent_variables, dependent_variable, offset_variable) if (FIT_CACHE_DIRECTORY) else None
+  if ((cache_file_name) and (os.path.exists(cache_file_name))):
+    with open(cache_file_name, "rb") as cache_file:
+      return pickle.load(cache_file)
 
-        vcov <- vcovHC(model, type = "HC3")
-        coefficients <- coeftest(model, vcov. = vcov)
-        confidence_intervals <- coefci(model, level = 0.95, vcov. = vcov)
-        marg_effects <- summary(margins(model, data = data, vcov = vcov, level = 0.95, variables = {variables}, change = {ame_change}))
+  results = GLM_BACKENDS[REGRESSION_BACKEND](data, independent_variables, dependent_variable, offset_variable, start_coefficients = start_coefficients, base_selection = base_selection)
 
-        fit_rmse <- rmse(data${dependent_variable}, predict(model, newdata = data, type = "response"))
-        model <- glm({formula_offset}, data = data, family = poisson(link = "log"))
-        qaic <- qAIC(model, dispersion=dispersion, nobs=length(data))
+  if (cache_file_name):
+    os.makedirs(FIT_CACHE_DIRECTORY, exist_ok = True)
+    with open(cache_file_name + ".%d" % (os.getpid(),), "wb") as cache_file:
+      pickle.dump(results, cache_file)
+    os.replace(cache_file_name + ".%d" % (os.getpid(),), cache_file_name)
 
-        return(list(row.names(coefficients), coefficients, confidence_intervals, marg_effects, dispersion_p, dispersion_alpha, fit_rmse, qaic))
-      }}
-    """
-    ro.r(r_code.format(formula_offset = formula_offset, variables = variables, ame_change = ame_change, dependent_variable = dependent_variable))
+  return results
 
-    variable_names, coefficients_matrix, intervals_matrix, marginal_effects, dispersion_p, dispersion_alpha, fit_rmse, qaic = ro.globalenv["fit_model"](data)
+def fit_r_glm(data, independent_variables, dependent_variable, offset_variable, start_coefficients = None, base_selection = None):
+  model_results = {"num_data": data.shape[0], "dependent_std_dev": float(stdev(data[dependent_variable].tolist())), "dependent_mean": float(mean(data[dependent_variable].tolist()))}
+  variable_results = {}
+
+  formula_offset = generate_formula(independent_variables, dependent_variable, offset_variable)
+  variables = [v for v in independent_variables if (not v.startswith("lagged_"))]
+  ame_half = float(AME_RANGE_SD) / 2.0
+
+  ro = initialize_r()
+  from rpy2.robjects.conversion import localconverter
+
+  start_values = None
+  if (start_coefficients):
+    start_values = ro.FloatVector(list(start_coefficients.values()))
+    start_values.names = ro.StrVector(list(start_coefficients.keys()))
+
+  with localconverter(R_STATE["converter"]):
+    variable_names, coefficients_matrix, intervals_matrix, marginal_effects, dispersion_p, dispersion_alpha, fit_rmse, qaic = R_STATE["fit_model"](load_r_data(data, offset_variable, base_selection = base_selection), formula_offset, ro.StrVector(variables) if (variables) else None, ro.FloatVector([-ame_half, ame_half]), str(dependent_variable), start_values)
     dispersion_p = dispersion_p[0]
     dispersion_alpha = dispersion_alpha[0]
     fit_rmse = fit_rmse[0]
@@ -154,45 +262,206 @@ def fit_glm(data, independent_variables, dependent_variable, offset_variable):
   return (model_results, variable_results)
 
 
-def prepare_regression_variables(node_year_variables, independent_variables, dependent_variable, offset_variable, dependent_lags = {1,}):
+def rename_statsmodels_variable(data, variable):
+  if (variable == "Intercept"):
+    return "(Intercept)"
+  if (variable.endswith("]")):
+    name, level = variable[:-1].split("[T.", 1)
+    return name if (data[name].dtype == bool) else (name + level)
+  return variable
+
+def order_statsmodels_variables(variables, independent_variables):
+  terms = [v.split("[T.", 1)[0] for v in variables]
+  return sorted(range(len(variables)), key = lambda i: (independent_variables.index(terms[i]) if (terms[i] in independent_variables) else -1))
+
+def compute_dispersion_test(poisson_results):
+  fitted = poisson_results.fittedvalues.values
+  auxiliary = (((poisson_results.model.endog - fitted) ** 2) - poisson_results.model.endog) / fitted
+  alpha = float(np.mean(auxiliary))
+  statistic = alpha / (float(np.std(auxiliary, ddof = 1)) / np.sqrt(len(auxiliary)))
+  return (alpha, float(norm.sf(statistic)))
+
+def compute_hc3_covariance(results):
+  design = results.model.exog
+  fitted = results.fittedvalues.values
+  bread = np.linalg.inv(design.T.dot(design * fitted[:, None]))
+  leverages = np.einsum("ij,jk,ik->i", design * np.sqrt(fitted)[:, None], bread, design * np.sqrt(fitted)[:, None])
+  scores = design * ((results.model.endog - fitted) / (1.0 - leverages))[:, None]
+  return bread.dot(scores.T.dot(scores)).dot(bread)
+
+def generate_marginal_changes(data, variable, change):
+  if (data[variable].dtype == bool):
+    return [(variable, False, True)]
+  if (not np.issubdtype(data[variable].dtype, np.number)):
+    levels = sorted(data[variable].unique())
+    return [(variable + str(l), levels[0], l) for l in levels[1:]]
+  return [(variable, change[0], change[1])]
+
+def compute_average_marginal_effects(results, data, variables, covariance, change):
+  marginal_effects = []
+  offset = getattr(results.model, "offset", None)
+  offset = offset if (offset is not None) else 0.0
+
+  for variable in variables:
+    for name, low, high in generate_marginal_changes(data, variable, change):
+      predictions = []
+      for value in (low, high):
+        changed = data.copy()
+        changed[variable] = value
+        design = np.asarray(build_design_matrices([results.model.data.design_info], changed)[0])
+        fitted = np.exp(design.dot(results.params.values) + offset)
+        predictions.append((design, fitted))
+
+      (low_design, low_fitted), (high_design, high_fitted) = predictions
+      ame = float(np.mean(high_fitted - low_fitted))
+      jacobian = ((high_design * high_fitted[:, None]) - (low_design * low_fitted[:, None])).mean(axis = 0)
+      std_error = float(np.sqrt(jacobian.dot(covariance).dot(jacobian)))
+      marginal_effects.append((name, ame, std_error))
+
+  return sorted(marginal_effects)
+
+def fit_statsmodels_glm(data, independent_variables, dependent_variable, offset_variable, start_coefficients = None, base_selection = None):
+  model_results = {"num_data": data.shape[0], "dependent_std_dev": float(stdev(data[dependent_variable].tolist())), "dependent_mean": float(mean(data[dependent_variable].tolist()))}
+  variable_results = {}
+
+  formula = generate_formula(independent_variables, dependent_variable, None)
+  offset = np.log(data[offset_variable].values) if (offset_variable) else None
+  ame_half = float(AME_RANGE_SD) / 2.0
+  critical_value = norm.ppf(0.975)
+
+  model = smf.glm(formula, data = data, family = sm.families.Poisson(), offset = offset)
+  start_params = [start_coefficients.get(rename_statsmodels_variable(data, v), 0.0) for v in model.exog_names] if (start_coefficients) else None
+  poisson_results = model.fit(start_params = start_params)
+  dispersion_alpha, dispersion_p = compute_dispersion_test(poisson_results)
+  results = model.fit(start_params = start_params, scale = "X2")
+  dispersion = float(results.scale)
+
+  model_results["regression_type"] = "quasi-Poisson"
+  model_results["dispersion_p-value"] = dispersion_p
+  model_results["dispersion_alpha"] = dispersion_alpha
+  model_results["qaic"] = ((-2.0 * float(poisson_results.llf)) / dispersion) + (2.0 * len(results.params))
+
+  model_results["fit_rmse"] = float(np.sqrt(np.mean((results.model.endog - results.fittedvalues.values) ** 2)))
+  model_results["fit_rmse_over_dep_std_dev"] = model_results["fit_rmse"] / model_results["dependent_std_dev"]
+
+  covariance = compute_hc3_covariance(results)
+  std_errors = np.sqrt(np.diag(covariance))
+  z_stats = results.params.values / std_errors
+
+  for i in order_statsmodels_variables(results.model.exog_names, independent_variables):
+    variable_results[rename_statsmodels_variable(data, results.model.exog_names[i])] = {
+      "coefficient": float(results.params.values[i]),
+      "coeff_std_error": float(std_errors[i]),
+      "coeff_z-statistic": float(z_stats[i]),
+      "coeff_p-value": float(2.0 * norm.sf(abs(z_stats[i]))),
+      "coeff_95_ci_lower": float(results.params.values[i] - (critical_value * std_errors[i])),
+      "coeff_95_ci_upper": float(results.params.values[i] + (critical_value * std_errors[i])),
+    }
+
+  variables = [v for v in independent_variables if (not v.startswith("lagged_"))]
+  for variable, ame, std_error in compute_average_marginal_effects(results, data, variables, covariance, (-ame_half, ame_half)):
+    z_stat = ame / std_error
+    variable_results[variable].update({
+      "avg_marginal_effect": ame,
+      "ame_std_error": std_error,
+      "ame_z-statistic": z_stat,
+      "ame_p-value": float(2.0 * norm.sf(abs(z_stat))),
+      "ame_95_ci_lower": ame - (critical_value * std_error),
+      "ame_95_ci_upper": ame + (critical_value * std_error),
+      "ame_over_sd": (float(ame) / model_results["dependent_std_dev"]),
+      "ame_std_error_over_sd": (float(std_error) / model_results["dependent_std_dev"])
+    })
+
+  return (model_results, variable_results)
+
+
+GLM_BACKENDS = {
+  "r": fit_r_glm,
+  "statsmodels": fit_statsmodels_glm,
+}
+
+
+def prepare_base_variables(node_year_variables):
+  return {
+    "data": node_year_variables,
+    "missing": node_year_variables.isna().to_numpy(),
+    "columns": {c: i for i, c in enumerate(node_year_variables.columns)},
+    "categorical_variables": set(node_year_variables.select_dtypes(exclude = ["number"]).columns).union({c for c in node_year_variables.columns if (c.startswith("categorical_"))}),
+  }
+
+def derive_regression_variables(base_variables, independent_variables, dependent_variable, offset_variable, dependent_lags = {1,}):
   lagged_dependent_variables = {generate_lagged_variable_name(dependent_variable, lag_length = lag_length) for lag_length in dependent_lags}
-  categorical_variables = set(node_year_variables.select_dtypes(exclude = ["number"]).columns).union({c for c in node_year_variables.columns if (c.startswith("categorical_"))}).intersection(set(independent_variables))
+  categorical_variables = base_variables["categorical_variables"].intersection(set(independent_variables))
   regressors = (set(independent_variables) | lagged_dependent_variables) - categorical_variables - {offset_variable}
 
-  regression_variables = remove_variables(node_year_variables, set(independent_variables) | {dependent_variable, *lagged_dependent_variables, offset_variable})
-  regression_variables, variable_means, variable_deviations = standardize_variables(regression_variables, regressors - lagged_dependent_variables)
+  columns = sorted((set(independent_variables) | {dependent_variable, *lagged_dependent_variables, offset_variable}) - {None})
+  rows = ~base_variables["missing"][:, [base_variables["columns"][c] for c in columns]].any(axis = 1)
+  regression_variables = base_variables["data"].loc[rows, columns].copy()
 
-  regression_variables = regression_variables.reindex(sorted(regression_variables.columns), axis = 1)
+  data = base_variables["data"]
+  standardized = [v for v in sorted(regressors - lagged_dependent_variables) if (np.issubdtype(data[v].dtype, np.number))]
+  values = np.asfortranarray(regression_variables[standardized].to_numpy(dtype = float))
+  means, deviations = values.mean(axis = 0), values.std(axis = 0)
+  if (standardized):
+    regression_variables[standardized] = (values - means) / deviations
   prepare_offset(regression_variables, offset_variable)
 
-  return (regression_variables, regressors | categorical_variables, variable_means, variable_deviations)
+  return (regression_variables, regressors | categorical_variables, dict(zip(standardized, means)), dict(zip(standardized, deviations)))
 
+def prepare_regression_variables(node_year_variables, independent_variables, dependent_variable, offset_variable, dependent_lags = {1,}):
+  return derive_regression_variables(prepare_base_variables(node_year_variables), independent_variables, dependent_variable, offset_variable, dependent_lags = dependent_lags)
 
-def fit_model(node_year_variables, independent_variables, dependent_variable, control_variables, offset_variable = None, dependent_lags = {1,}):
-  regression_variables, regressors, variable_means, variable_deviations = prepare_regression_variables(node_year_variables, independent_variables | control_variables, dependent_variable, offset_variable, dependent_lags = dependent_lags)
-  model_results, variable_results = fit_glm(regression_variables, list(sorted(list(regressors))), dependent_variable, offset_variable)
+
+def fit_model(node_year_variables, independent_variables, dependent_variable, control_variables, offset_variable = None, dependent_lags = {1,}, base_variables = None, start_coefficients = None):
+  base_variables = base_variables if (base_variables is not None) else prepare_base_variables(node_year_variables)
+  regression_variables, regressors, variable_means, variable_deviations = derive_regression_variables(base_variables, independent_variables | control_variables, dependent_variable, offset_variable, dependent_lags = dependent_lags)
+  base_selection = {"base_variables": base_variables, "means": variable_means, "deviations": variable_deviations}
+  model_results, variable_results = fit_glm(regression_variables, list(sorted(list(regressors))), dependent_variable, offset_variable, start_coefficients = start_coefficients, base_selection = base_selection)
   return (model_results, variable_results, variable_means, variable_deviations)
 
 
-def generate_variable_coefficients(node_year_variables, independent_variable_sets, dependent_variables, control_variables, offset_variable = None, dependent_lags = {1,}):
-  dependent_independent_results = {}
+def fit_grid_model(base_variables, dependent_variable, independent_variables, control_variables, offset_variable, dependent_lags, start_coefficients = None):
+  model_results, variable_results, _, _ = fit_model(base_variables["data"], independent_variables, dependent_variable, control_variables, offset_variable = offset_variable, dependent_lags = dependent_lags, base_variables = base_variables, start_coefficients = start_coefficients)
+  variable_vifs = load_variable_collinearities(base_variables, set(independent_variables) | control_variables)
+  return (model_results, variable_results, variable_vifs)
 
-  for dependent_variable in dependent_variables:
-    dependent_independent_results[dependent_variable] = {}
-    lagged_control_variables = set(control_variables) | {generate_lagged_variable_name(dependent_variable, lag_length = lag_length) for lag_length in dependent_lags}
+def initialize_regression_worker(base_variables):
+  WORKER_STATE["base_variables"] = base_variables
 
-    for independent_variables in independent_variable_sets:
-      key = frozenset(independent_variables)
-      dependent_independent_results[dependent_variable][key] = {}
+def run_regression_worker(grid_model):
+  return fit_grid_model(WORKER_STATE["base_variables"], *grid_model)
+
+def map_grid_models(base_variables, grid_models, num_processes = 1):
+  if ((num_processes > 1) and (len(grid_models) > 1)):
+    with get_context("spawn").Pool(min(num_processes, len(grid_models)), initializer = initialize_regression_worker, initargs = (base_variables,)) as pool:
+      return pool.map(run_regression_worker, grid_models, chunksize = 1)
+  return [fit_grid_model(base_variables, *grid_model) for grid_model in grid_models]
 
-      model_results, variable_results, _, _ = fit_model(node_year_variables, independent_variables, dependent_variable, lagged_control_variables, offset_variable = offset_variable, dependent_lags = dependent_lags)
-      variable_vifs = compute_variable_collinearities(node_year_variables[set(independent_variables) | lagged_control_variables].dropna())
 
-      for variable, results in variable_results.items():
-        augmented_results = dict(results)
-        augmented_results.update({("model_" + key): value for key, value in model_results.items()})
-        augmented_results["vif"] = variable_vifs[variable] if (variable in variable_vifs) else None
-        dependent_independent_results[dependent_variable][key][variable] = augmented_results
+def extract_start_coefficients(dependent_independent_results, dependent_variable, independent_variables):
+  variable_results = dependent_independent_results.get(dependent_variable, {}).get(frozenset(independent_variables))
+  return {variable: results["coefficient"] for variable, results in variable_results.items()} if (variable_results) else None
+
+def generate_variable_coefficients(node_year_variables, independent_variable_sets, dependent_variables, control_variables, offset_variable = None, dependent_lags = {1,}, num_processes = 1, base_variables = None, start_results = None):
+  dependent_independent_results = {dependent_variable: {} for dependent_variable in dependent_variables}
+  base_variables = base_variables if (base_variables is not None) else prepare_base_variables(node_year_variables)
+
+  grid_models = []
+  for dependent_variable in dependent_variables:
+    lagged_control_variables = set(control_variables) | {generate_lagged_variable_name(dependent_variable, lag_length = lag_length) for lag_length in dependent_lags}
+    for independent_variables in independent_variable_sets:
+      start_coefficients = extract_start_coefficients(start_results, dependent_variable, independent_variables) if (start_results) else None
+      grid_models.append((dependent_variable, independent_variables, lagged_control_variables, offset_variable, dependent_lags, start_coefficients))
+
+  for (dependent_variable, independent_variables, _, _, _, _), (model_results, variable_results, variable_vifs) in zip(grid_models, map_grid_models(base_variables, grid_models, num_processes = num_processes)):
+    key = frozenset(independent_variables)
+    dependent_independent_results[dependent_variable][key] = {}
+
+    for variable, results in variable_results.items():
+      augmented_results = dict(results)
+      augmented_results.update({("model_" + key): value for key, value in model_results.items()})
+      augmented_results["vif"] = variable_vifs[variable] if (variable in variable_vifs) else None
+      dependent_independent_results[dependent_variable][key][variable] = augmented_results
 
   return dependent_independent_results
 
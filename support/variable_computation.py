@@ -4,19 +4,59 @@
 
 
 import csv
+from itertools import islice
+from multiprocessing import Pool
+from weakref import WeakKeyDictionary
+import numpy as np
+import pandas as pd
+import networkx as nx
+from scipy.sparse import csr_matrix, diags
+from scipy.sparse.linalg import LinearOperator, eigs, eigsh
 
 
-def compute_citations(citation_graph, start_year, end_year):
-  decision_citations = {}
+CENTRALITY_TOLERANCE = 1.0e-10
+CENTRALITY_MAX_ITERATIONS = 1000
+
+CITATION_COUNTS = WeakKeyDictionary()
+WORKER_STATE = {}
+
+
+def index_citation_years(citation_graph):
+  nodes = list(citation_graph.nodes())
+  node_indices = {n: i for i, n in enumerate(nodes)}
+  edges = list(citation_graph.edges(data = "year"))
+  years = np.unique(np.array([y for _, _, y in edges]))
+
+  counts = np.zeros((len(nodes), len(years) + 1), dtype = np.int64)
+  targets = np.array([node_indices[t] for _, t, _ in edges], dtype = int)
+  np.add.at(counts, (targets, np.searchsorted(years, np.array([y for _, _, y in edges])) + 1), 1)
+
+  return {
+    "size": (citation_graph.number_of_nodes(), citation_graph.number_of_edges()),
+    "nodes": nodes,
+    "node_indices": node_indices,
+    "years": years,
+    "cumulative_counts": counts.cumsum(axis = 1),
+  }
+
+def load_citation_counts(citation_graph):
+  if ((citation_graph not in CITATION_COUNTS) or (CITATION_COUNTS[citation_graph]["size"] != (citation_graph.number_of_nodes(), citation_graph.number_of_edges()))):
+    CITATION_COUNTS[citation_graph] = index_citation_years(citation_graph)
+  return CITATION_COUNTS[citation_graph]
+
+def compute_citation_windows(citation_graph, year_pairs, nodes = None):
+  citation_counts = load_citation_counts(citation_graph)
+  nodes = citation_counts["nodes"] if (nodes is None) else list(nodes)
+  cumulative_counts = citation_counts["cumulative_counts"][[citation_counts["node_indices"][n] for n in nodes]]
 
-  for decision in citation_graph.nodes():
-    decision_citations[decision] = 0
-    for predecessor in citation_graph.predecessors(decision):
-      year = citation_graph.get_edge_data(predecessor, decision)["year"]
-      if ((year >= start_year) and (year <= end_year)):
-        decision_citations[decision] += 1
+  start_columns = np.searchsorted(citation_counts["years"], np.array([s for s, _ in year_pairs]), side = "left")
+  end_columns = np.searchsorted(citation_counts["years"], np.array([e for _, e in year_pairs]), side = "right")
+  windows = cumulative_counts[:, end_columns] - cumulative_counts[:, start_columns]
 
-  return decision_citations
+  return {e - s + 1: dict(zip(nodes, windows[:, i].tolist())) for i, (s, e) in enumerate(year_pairs)}
+
+def compute_citations(citation_graph, start_year, end_year):
+  return compute_citation_windows(citation_graph, [(start_year, end_year)])[end_year - start_year + 1]
 
 def compute_properties(graph, property_function, weighted = False, normalized = False):
   node_degrees = {}
@@ -29,8 +69,193 @@ def compute_properties(graph, property_function, weighted = False, normalized =
   return node_degrees
 
 
-def compute_independent_variables(independent_variables, graph, damping_factor):
-  return {v: f(graph, damping_factor) for v, f in independent_variables.items()}
+def compute_warm_start(nodes, previous_values):
+  warm_start = None
+  if ((previous_values) and (sum(previous_values.values()) > 0)):
+    default = 1.0 / float(len(nodes))
+    warm_start = np.array([(previous_values[n] if (n in previous_values) else default) for n in nodes], dtype = float)
+  return warm_start
+
+def compute_transition_matrix(weights):
+  out_weights = np.asarray(weights.sum(axis = 1)).flatten()
+  dangling = (out_weights == 0)
+  out_weights[~dangling] = 1.0 / out_weights[~dangling]
+  return ((diags(out_weights) * weights).T.tocsr(), dangling)
+
+def normalize_vector(vector):
+  vector = vector.real
+  return vector / float(vector.sum())
+
+
+def compute_dense_pagerank(weights, damping_factor, tolerance = CENTRALITY_TOLERANCE, warm_start = None):
+  num_nodes = weights.shape[0]
+  uniform = np.repeat(1.0 / num_nodes, num_nodes)
+  transition = weights.toarray()
+  transition[transition.sum(axis = 1) == 0] = uniform
+  transition /= transition.sum(axis = 1, keepdims = True)
+
+  eigenvalues, eigenvectors = np.linalg.eig(((damping_factor * transition) + ((1 - damping_factor) * uniform)).T)
+  return normalize_vector(eigenvectors[:, np.argmax(eigenvalues)])
+
+def compute_dense_hits(weights, tolerance = CENTRALITY_TOLERANCE, warm_start = None):
+  adjacency = weights.toarray()
+  eigenvalues, eigenvectors = np.linalg.eig(np.dot(adjacency, adjacency.T))
+  hubs = eigenvectors[:, eigenvalues.argsort()[-1]]
+  eigenvalues, eigenvectors = np.linalg.eig(np.dot(adjacency.T, adjacency))
+  authorities = eigenvectors[:, eigenvalues.argsort()[-1]]
+  return (normalize_vector(hubs), normalize_vector(authorities))
+
+def compute_power_pagerank(weights, damping_factor, tolerance = CENTRALITY_TOLERANCE, warm_start = None):
+  num_nodes = weights.shape[0]
+  uniform = np.repeat(1.0 / num_nodes, num_nodes)
+  transition, dangling = compute_transition_matrix(weights)
+
+  scores = (warm_start / warm_start.sum()) if (warm_start is not None) else uniform
+  for _ in range(CENTRALITY_MAX_ITERATIONS):
+    last_scores = scores
+    scores = (damping_factor * ((transition * last_scores) + (last_scores[dangling].sum() * uniform))) + ((1 - damping_factor) * uniform)
+    if (np.abs(scores - last_scores).sum() < (num_nodes * tolerance)):
+      return scores
+  raise nx.PowerIterationFailedConvergence(CENTRALITY_MAX_ITERATIONS)
+
+def compute_power_hits(weights, tolerance = CENTRALITY_TOLERANCE, warm_start = None):
+  if (weights.nnz == 0):
+    return compute_dense_hits(weights)
+
+  transposed = weights.T.tocsr()
+  hubs = np.array(warm_start) if (warm_start is not None) else np.ones(weights.shape[0])
+  hubs /= hubs.max()
+
+  for _ in range(CENTRALITY_MAX_ITERATIONS):
+    last_hubs = hubs
+    hubs = weights * (transposed * last_hubs)
+    hubs /= hubs.max()
+    if (np.abs(hubs - last_hubs).sum() < tolerance):
+      authorities = transposed * hubs
+      return (hubs / hubs.sum(), authorities / authorities.sum())
+  return compute_dense_hits(weights)
+
+def compute_arpack_pagerank(weights, damping_factor, tolerance = CENTRALITY_TOLERANCE, warm_start = None):
+  num_nodes = weights.shape[0]
+  if (num_nodes < 3):
+    return compute_dense_pagerank(weights, damping_factor)
+
+  uniform = np.repeat(1.0 / num_nodes, num_nodes)
+  transition, dangling = compute_transition_matrix(weights)
+  google = LinearOperator((num_nodes, num_nodes), matvec = lambda v: (damping_factor * ((transition * v) + (v[dangling].sum() * uniform))) + ((1 - damping_factor) * v.sum() * uniform), dtype = float)
+
+  _, eigenvectors = eigs(google, k = 1, which = "LM", v0 = warm_start, tol = tolerance, maxiter = CENTRALITY_MAX_ITERATIONS)
+  return normalize_vector(eigenvectors[:, 0])
+
+def compute_arpack_hits(weights, tolerance = CENTRALITY_TOLERANCE, warm_start = None):
+  if ((weights.shape[0] < 3) or (weights.nnz == 0)):
+    return compute_dense_hits(weights)
+
+  transposed = weights.T.tocsr()
+  _, eigenvectors = eigsh(weights * transposed, k = 1, which = "LA", v0 = warm_start, tol = tolerance, maxiter = CENTRALITY_MAX_ITERATIONS)
+  hubs = normalize_vector(eigenvectors[:, 0])
+  if (hubs.min() < -tolerance):
+    return compute_dense_hits(weights)
+  return (hubs, normalize_vector(transposed * hubs))
+
+
+CENTRALITY_BACKENDS = {
+  "numpy": {"pagerank": compute_dense_pagerank, "hits": compute_dense_hits},
+  "power": {"pagerank": compute_power_pagerank, "hits": compute_power_hits},
+  "arpack": {"pagerank": compute_arpack_pagerank, "hits": compute_arpack_hits},
+}
+
+
+def provide(context, provider):
+  if (provider not in context["results"]):
+    context["results"][provider] = provider(context)
+  return context["results"][provider]
+
+def index_adjacency(graph):
+  nodes = list(graph.nodes())
+  node_indices = {n: i for i, n in enumerate(nodes)}
+  edges = [(node_indices[s], node_indices[t], a.get("weight", 1)) for s, t, a in graph.edges(data = True)]
+
+  return {
+    "nodes": nodes,
+    "node_indices": node_indices,
+    "num_successors": {n: len(graph.succ[n]) for n in nodes},
+    "rows": np.array([e[0] for e in edges], dtype = int),
+    "columns": np.array([e[1] for e in edges], dtype = int),
+    "weights": np.array([e[2] for e in edges], dtype = float),
+  }
+
+def extend_adjacency_index(adjacency_index, graph, changed_nodes):
+  nodes, node_indices, num_successors = adjacency_index["nodes"], adjacency_index["node_indices"], adjacency_index["num_successors"]
+  for node in islice(graph.nodes(), len(nodes), None):
+    node_indices[node] = len(nodes)
+    nodes.append(node)
+
+  edges = []
+  for node in changed_nodes:
+    successors = list(graph.succ[node].items())
+    edges += [(node_indices[node], node_indices[t], a.get("weight", 1)) for t, a in successors[num_successors.get(node, 0):]]
+    num_successors[node] = len(successors)
+
+  adjacency_index["rows"] = np.concatenate([adjacency_index["rows"], np.array([e[0] for e in edges], dtype = int)])
+  adjacency_index["columns"] = np.concatenate([adjacency_index["columns"], np.array([e[1] for e in edges], dtype = int)])
+  adjacency_index["weights"] = np.concatenate([adjacency_index["weights"], np.array([e[2] for e in edges], dtype = float)])
+
+def provide_adjacency(context):
+  state = context["state"]
+  if ((state is None) or (context["changed_nodes"] is None) or ("adjacency_index" not in state)):
+    adjacency_index = index_adjacency(context["graph"])
+    if (state is not None):
+      state["adjacency_index"] = adjacency_index
+  else:
+    adjacency_index = state["adjacency_index"]
+    extend_adjacency_index(adjacency_index, context["graph"], context["changed_nodes"])
+
+  nodes, rows, columns = adjacency_index["nodes"], adjacency_index["rows"], adjacency_index["columns"]
+  shape = (len(nodes), len(nodes))
+
+  return {
+    "nodes": nodes,
+    "node_indices": adjacency_index["node_indices"],
+    "weights": csr_matrix((adjacency_index["weights"], (rows, columns)), shape = shape),
+    "edges": csr_matrix((np.ones(len(rows)), (rows, columns)), shape = shape),
+    "in_degrees": np.bincount(columns, minlength = len(nodes)),
+    "out_degrees": np.bincount(rows, minlength = len(nodes)),
+  }
+
+def provide_degrees(context):
+  adjacency = provide(context, provide_adjacency)
+  num_nodes = float(len(adjacency["nodes"]))
+  in_degrees = adjacency["in_degrees"] / num_nodes
+  out_degrees = adjacency["out_degrees"] / num_nodes
+  return {"in_degree": dict(zip(adjacency["nodes"], in_degrees.tolist())), "out_degree": dict(zip(adjacency["nodes"], out_degrees.tolist()))}
+
+def provide_pagerank(context):
+  adjacency = provide(context, provide_adjacency)
+  if (not adjacency["nodes"]):
+    return {"pagerank": {}}
+
+  warm_start = compute_warm_start(adjacency["nodes"], context["previous_variables"].get("pagerank"))
+  scores = CENTRALITY_BACKENDS[context["backend"]]["pagerank"](adjacency["weights"], context["damping_factor"], tolerance = context["tolerance"], warm_start = warm_start)
+  return {"pagerank": dict(zip(adjacency["nodes"], scores.tolist()))}
+
+def provide_hits(context):
+  adjacency = provide(context, provide_adjacency)
+  if (not adjacency["nodes"]):
+    return {"hub": {}, "authority": {}}
+
+  warm_start = compute_warm_start(adjacency["nodes"], context["previous_variables"].get("hub"))
+  hubs, authorities = CENTRALITY_BACKENDS[context["backend"]]["hits"](adjacency["weights"], tolerance = context["tolerance"], warm_start = warm_start)
+  return {"hub": dict(zip(adjacency["nodes"], hubs.tolist())), "authority": dict(zip(adjacency["nodes"], authorities.tolist()))}
+
+
+def compute_independent_variables(independent_variables, graph, damping_factor, previous_variables = None, changed_nodes = None, state = None, backend = "numpy", tolerance = CENTRALITY_TOLERANCE):
+  independent_values = {}
+  context = {"graph": graph, "damping_factor": damping_factor, "previous_variables": (previous_variables if (previous_variables) else {}), "changed_nodes": changed_nodes, "state": state, "backend": backend, "tolerance": tolerance, "results": {}}
+  for variable, (provider, metric) in independent_variables.items():
+    values = provide(context, provider)
+    independent_values[variable] = values[metric] if (metric is not None) else values
+  return independent_values
 
 
 def compute_unanimities(citation_graph):
@@ -72,30 +297,71 @@ def parse_dependent_variable_years(dependent_variable_name):
 def generate_lagged_variable_name(variable_name, lag_length = 1):
   return "lagged_" + variable_name + ("_%d" % (lag_length,) if (lag_length > 1) else "")
 
-def compute_lagged_variables(node_year_variables, dependent_variable, node, year, lag_lengths, normalizer_variable = None):
-  lagged_variables = {}
-  dependent_num_years = parse_dependent_variable_years(dependent_variable)
+def shift_panel(panel, num_years):
+  shifted = np.full(panel.shape, np.nan if (panel.dtype == float) else False, dtype = panel.dtype)
+  if (num_years < panel.shape[1]):
+    shifted[:, num_years:] = panel[:, :panel.shape[1] - num_years]
+  return shifted
+
+def compute_panel_lagged_variables(node_year_variables, num_dependent_years, lag_lengths, normalizer_variable = None):
+  keys = list(node_year_variables.keys())
+  node_codes, _ = pd.factorize(pd.Series([n for n, _ in keys], dtype = object))
+  years = np.array([y for _, y in keys], dtype = int)
+  year_offsets = years - years.min()
+  shape = (node_codes.max() + 1, year_offsets.max() + 1)
+
+  present = np.zeros(shape, dtype = bool)
+  present[node_codes, year_offsets] = True
+  variable_names = {generate_dependent_variable_name(num_years) for max_years in num_dependent_years for num_years in range(1, max_years + 1)}
+  if (normalizer_variable is not None):
+    variable_names.add(normalizer_variable)
+
+  panels = {}
+  for variable_name in variable_names:
+    panels[variable_name] = np.full(shape, np.nan)
+    panels[variable_name][node_codes, year_offsets] = [float(node_year_variables[k].get(variable_name, np.nan)) for k in keys]
+
+  for num_years in num_dependent_years:
+    dependent_variable = generate_dependent_variable_name(num_years)
+    rows = [i for i, k in enumerate(keys) if (dependent_variable in node_year_variables[k])]
+
+    for lag_length in lag_lengths:
+      offset = lag_length * num_years
+      found = shift_panel(present, offset)
+      lagged = shift_panel(panels[dependent_variable], offset)
+      normalizers = shift_panel(panels[normalizer_variable], offset) if (normalizer_variable is not None) else None
+
+      for y in range(1, num_years):
+        fallback = (~found) & shift_panel(present, offset - y)
+        lagged[fallback] = shift_panel(panels[generate_dependent_variable_name(num_years - y)], offset - y)[fallback]
+        if (normalizer_variable is not None):
+          normalizers[fallback] = shift_panel(panels[normalizer_variable], offset - y)[fallback]
+        found |= fallback
+
+      if (normalizer_variable is not None):
+        found &= (normalizers > 0)
+        lagged[found] /= normalizers[found]
 
-  for lag_length in lag_lengths:
-    lagged_dependent_name = generate_lagged_variable_name(dependent_variable, lag_length = lag_length)
-    adjusted_year = year - (lag_length * dependent_num_years)
-    adjusted_dependent = dependent_variable
+      lagged_dependent_name = generate_lagged_variable_name(dependent_variable, lag_length = lag_length)
+      row_values = lagged[node_codes[rows], year_offsets[rows]].tolist()
+      row_found = found[node_codes[rows], year_offsets[rows]].tolist()
+      for i, value, is_found in zip(rows, row_values, row_found):
+        node_year_variables[keys[i]][lagged_dependent_name] = value if (is_found) else 0
 
-    if ((node, adjusted_year) not in node_year_variables):
-      for y in range(1, dependent_num_years):
-        if ((node, adjusted_year + y) in node_year_variables):
-          adjusted_year += y
-          adjusted_dependent = generate_dependent_variable_name(dependent_num_years - y)
-          break
+  return node_year_variables
 
-    if (((node, adjusted_year) in node_year_variables) and ((normalizer_variable is None) or (node_year_variables[(node, adjusted_year)][normalizer_variable] > 0))):
-      lagged_variables[lagged_dependent_name] = float(node_year_variables[(node, adjusted_year)][adjusted_dependent])
-      if (normalizer_variable is not None):
-        lagged_variables[lagged_dependent_name] /= float(node_year_variables[(node, adjusted_year)][normalizer_variable])
-    else:
-      lagged_variables[lagged_dependent_name] = 0
 
-  return lagged_variables
+def initialize_year_worker(year_function):
+  WORKER_STATE["year_function"] = year_function
+
+def run_year_worker(year):
+  return WORKER_STATE["year_function"](year)
+
+def map_years(year_function, years, num_processes = 1):
+  if (num_processes > 1):
+    with Pool(num_processes, initializer = initialize_year_worker, initargs = (year_function,)) as pool:
+      return pool.map(run_year_worker, years, chunksize = 1)
+  return [year_function(year) for year in years]
 
 
 def write_variables(file_name, node_year_variables, node_class):
@@ -0,0 +1,24 @@
+# test_extract_judges.py
+
+
+from extract_judges import preamble_judges, determine_judges, determine_mapped_judges
+
+
+PREAMBLE_LINES = ["President Smith;", "Judges Jones, Brown;", "Judge ad hoc Alvarez;", "Registrar Doe."]
+PREAMBLE_SEPARATORS = ["\n", "\r", "\r\n", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", " ", " "]
+
+
+def test_preamble_line_separators():
+  for separator in PREAMBLE_SEPARATORS:
+    decision = "BEFORE: " + separator.join(PREAMBLE_LINES) + separator + "PermaLink: x\n"
+    assert preamble_judges(decision) == ({"smith", "jones", "brown"}, {"alvarez"})
+
+def test_mapped_overlapping_dissent_headings():
+  decision = "BEFORE: President Smith;\nJudges Jones, Brown;\nPermaLink: x\nDissenting opinion of \nDissenting opinion of Judge Jones\nend\n"
+  assert determine_mapped_judges(decision.encode()) == determine_judges(decision)
+  assert determine_mapped_judges(decision.replace("\n", "\r\n").encode()) == determine_judges(decision)
+
+def test_mapped_wrapped_crlf_dissent_heading():
+  decision = "BEFORE: President Smith;\nJudges Jones, Brown;\nPermaLink: x\nDissenting opinion of \nJudge Brown\nend\n"
+  assert determine_mapped_judges(decision.replace("\n", "\r\n").encode()) == determine_judges(decision)
+  assert determine_judges(decision)["brown"] == (-1, False)